@@ -1,40 +1,641 @@
-import pandas as pd
+import os
+import re
+import csv
+import sys
+import math
+import heapq
+import pickle
+import threading
+from array import array
+from collections import defaultdict
 from utils import clear_screen, print_centered
 
+# Columns covered by the search index, in the order they are checked
+SEARCH_COLUMNS = ['Code', 'City', 'Airport_Name', 'Country']
+GRAM_SIZE = 3
+# Bump whenever the pickled layout of AirportLookup data changes
+SNAPSHOT_VERSION = 4
+CODE_WIDTH = 3
+# Mean Earth radius used for great-circle distances
+EARTH_RADIUS_KM = 6371.0088
+
+# Ranking tiers used by AirportIndex.rank, best first
+EXACT_CODE, CITY_PREFIX, WORD_PREFIX, SUBSTRING, ONE_TYPO = range(5)
+# Shortest word that typo-tolerant matching is attempted for
+MIN_TYPO_LENGTH = 4
+# How many ranked airports the interactive prompt shows
+MAX_SELECTION_RESULTS = 15
+
+# Confidence reported by resolve_many for each ranking tier
+TIER_CONFIDENCE = {
+    EXACT_CODE: 1.0,
+    CITY_PREFIX: 0.7,
+    WORD_PREFIX: 0.55,
+    SUBSTRING: 0.4,
+    ONE_TYPO: 0.45,
+}
+EXACT_CITY_CONFIDENCE = 0.95
+EXACT_PLACE_CONFIDENCE = 0.85
+# Candidates scoring within this margin of the best make a query ambiguous
+AMBIGUITY_MARGIN = 0.1
+# Free text such as "Lisbon (LIS)" carries its own IATA code
+EMBEDDED_CODE = re.compile(r'\(([a-z]{3})\)\s*$')
+
+def _place_name(city):
+    """City without airport or state detail: 'london - heathrow' -> 'london'"""
+    return re.split(r' - |\s*\(', city, maxsplit=1)[0].strip()
+
+def _deletions(word):
+    """Every variant of word with exactly one character removed"""
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+def _within_one_edit(a, b):
+    """True if a and b differ by at most one insert, delete, substitution or swap"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) < len(b):
+        return a[i:] == b[i + 1:]
+    if a[i + 1:] == b[i + 1:]:
+        return True
+    # Adjacent transposition, e.g. 'lsibon' vs 'lisbon'
+    return i + 1 < len(a) and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+
+class Airport:
+    """A single airport row, as returned by searches"""
+    __slots__ = ('row', 'code', 'city', 'airport_name', 'country', 'latitude', 'longitude')
+
+    def __init__(self, row, code, city, airport_name, country, latitude=None, longitude=None):
+        self.row = row
+        self.code = code
+        self.city = city
+        self.airport_name = airport_name
+        self.country = country
+        self.latitude = latitude
+        self.longitude = longitude
+
+    def __repr__(self):
+        return f"Airport({self.code!r}, {self.city!r}, {self.country!r})"
+
+    @property
+    def full_name(self):
+        """Display name, e.g. 'Lisbon - Portela (LIS) - Portugal'"""
+        text = f"{self.city}"
+        if self.airport_name:
+            text += f" - {self.airport_name}"
+        return text + f" ({self.code}) - {self.country}"
+
+    def to_dict(self):
+        """Return the selection dict used by the trip planning flow"""
+        return {
+            'code': self.code,
+            'city': self.city,
+            'airport': self.airport_name,
+            'country': self.country,
+            'full_name': self.full_name
+        }
+
+class AirportTable:
+    """Compact column store for the airport catalog.
+
+    IATA codes live in one contiguous byte string, countries are stored once
+    and referenced by a small integer id, and Airport records are only built
+    for the rows a caller actually reads.
+    """
+
+    def __init__(self):
+        self.codes = bytearray()
+        self.cities = []
+        self.airport_names = []
+        self.country_ids = array('H')
+        self.countries = []
+        self._country_lookup = {}
+        # NaN marks airports without known coordinates
+        self.latitudes = array('d')
+        self.longitudes = array('d')
+
+    @classmethod
+    def from_csv(cls, csv_path):
+        """Load the Code,Airport,Country CSV, splitting Airport into city and name"""
+        table = cls()
+        skipped = 0
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            for record in csv.DictReader(f):
+                code = (record.get('Code') or '').strip().upper()
+                if len(code) != CODE_WIDTH or not code.isascii():
+                    skipped += 1
+                    continue
+                # Split Airport column into City and Airport name where applicable
+                city, _, airport_name = (record.get('Airport') or '').partition(',')
+                table.append(code, city.strip(), airport_name.strip(), (record.get('Country') or '').strip())
+        if skipped:
+            print(f"Skipped {skipped} airport rows without a valid IATA code")
+        return table
+
+    def append(self, code, city, airport_name, country):
+        self.codes += code.encode('ascii')
+        self.cities.append(city)
+        self.airport_names.append(airport_name)
+        country_id = self._country_lookup.get(country)
+        if country_id is None:
+            country_id = self._country_lookup[country] = len(self.countries)
+            self.countries.append(sys.intern(country))
+        self.country_ids.append(country_id)
+        self.latitudes.append(math.nan)
+        self.longitudes.append(math.nan)
+
+    def load_coordinates(self, csv_path):
+        """Fill in latitude/longitude from a Code,Latitude,Longitude CSV"""
+        rows_by_code = {}
+        for row in range(len(self)):
+            rows_by_code.setdefault(self.code(row), []).append(row)
+
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            for record in csv.DictReader(f):
+                for row in rows_by_code.get(record['Code'].strip().upper(), ()):
+                    self.latitudes[row] = float(record['Latitude'])
+                    self.longitudes[row] = float(record['Longitude'])
+
+    def coordinates(self, row):
+        """Return (latitude, longitude) for row, or None if unknown"""
+        latitude = self.latitudes[row]
+        if math.isnan(latitude):
+            return None
+        return latitude, self.longitudes[row]
+
+    def __len__(self):
+        return len(self.cities)
+
+    def code(self, row):
+        start = row * CODE_WIDTH
+        return self.codes[start:start + CODE_WIDTH].decode('ascii')
+
+    def country(self, row):
+        return self.countries[self.country_ids[row]]
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return Airport(row, self.code(row), self.cities[row], self.airport_names[row], self.country(row),
+                       *(self.coordinates(row) or (None, None)))
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+    def rows(self):
+        """Yield (Code, City, Airport_Name, Country) tuples in table order"""
+        for row in range(len(self)):
+            yield self.code(row), self.cities[row], self.airport_names[row], self.country(row)
+
+def _unit_vector(latitude, longitude):
+    """Position on the unit sphere for a latitude/longitude in degrees"""
+    latitude, longitude = math.radians(latitude), math.radians(longitude)
+    cos_latitude = math.cos(latitude)
+    return (cos_latitude * math.cos(longitude), cos_latitude * math.sin(longitude), math.sin(latitude))
+
+def _chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+def _km_to_chord(km):
+    return 2 * math.sin(min(math.pi, km / EARTH_RADIUS_KM) / 2)
+
+class SpatialIndex:
+    """KD-tree over airport positions for nearest and radius queries.
+
+    Points are stored as 3D unit vectors: straight-line distance through the
+    sphere orders points exactly like great-circle distance, and there is no
+    special casing for the date line or the poles.
+    """
+
+    def __init__(self, points):
+        # points: iterable of (row, latitude, longitude)
+        nodes = [(_unit_vector(latitude, longitude), row) for row, latitude, longitude in points]
+        self.size = len(nodes)
+        self.root = self._build(nodes, 0)
+
+    def _build(self, nodes, axis):
+        """Build a balanced subtree as (point, row, axis, left, right) tuples"""
+        if not nodes:
+            return None
+        nodes.sort(key=lambda node: node[0][axis])
+        middle = len(nodes) // 2
+        next_axis = (axis + 1) % 3
+        return (
+            nodes[middle][0], nodes[middle][1], axis,
+            self._build(nodes[:middle], next_axis),
+            self._build(nodes[middle + 1:], next_axis)
+        )
+
+    def __len__(self):
+        return self.size
+
+    def nearest(self, latitude, longitude, k=5, max_km=None):
+        """Return up to k (distance_km, row) pairs closest to the point"""
+        target = _unit_vector(latitude, longitude)
+        limit = _km_to_chord(max_km) ** 2 if max_km is not None else math.inf
+        # Max-heap (by negated squared distance) of the best k so far
+        best = []
+
+        def visit(node):
+            if node is None:
+                return
+            point, row, axis, left, right = node
+            distance = sum((a - b) ** 2 for a, b in zip(target, point))
+            if distance <= limit:
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, row))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, row))
+
+            offset = target[axis] - point[axis]
+            near, far = (left, right) if offset < 0 else (right, left)
+            visit(near)
+            # Only cross the splitting plane if it is closer than the worst kept point
+            bound = -best[0][0] if len(best) == k else limit
+            if offset * offset <= bound:
+                visit(far)
+
+        if k > 0:
+            visit(self.root)
+        return sorted((_chord_to_km(math.sqrt(-distance)), row) for distance, row in best)
+
+    def within(self, latitude, longitude, radius_km):
+        """Return all (distance_km, row) pairs within radius_km, nearest first"""
+        target = _unit_vector(latitude, longitude)
+        limit = _km_to_chord(radius_km) ** 2
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            point, row, axis, left, right = node
+            distance = sum((a - b) ** 2 for a, b in zip(target, point))
+            if distance <= limit:
+                found.append((_chord_to_km(math.sqrt(distance)), row))
+
+            offset = target[axis] - point[axis]
+            stack.append(left if offset < 0 else right)
+            if offset * offset <= limit:
+                stack.append(right if offset < 0 else left)
+        return sorted(found)
+
+class AirportIndex:
+    """Inverted token and n-gram index over the searchable airport columns.
+
+    Every column value is lowercased once and its trigrams (plus bigrams, so
+    two-letter queries stay exact) are posted to the rows containing them.
+    A query only has to verify the rows that hold all of its trigrams instead
+    of scanning the whole table.
+    """
+
+    def __init__(self, rows):
+        # rows: iterable of tuples with one string per SEARCH_COLUMNS entry
+        self.texts = []
+        self.codes = {}
+        # Postings are appended in row order, so they stay sorted and an
+        # array of unsigned ints is all the storage a row id needs
+        self.grams = defaultdict(lambda: array('I'))
+        self.tokens = defaultdict(lambda: array('I'))
+
+        for row_id, row in enumerate(rows):
+            fields = tuple(str(value).lower() for value in row)
+            self.texts.append(fields)
+            self.codes.setdefault(fields[0], row_id)
+            for field in fields:
+                for token in re.findall(r'\w+', field):
+                    self._post(self.tokens[token], row_id)
+                for size in (2, GRAM_SIZE):
+                    for i in range(len(field) - size + 1):
+                        self._post(self.grams[field[i:i + size]], row_id)
+
+        self.grams = dict(self.grams)
+        self.tokens = dict(self.tokens)
+
+        # Symmetric-delete index: every word and its one-deletion variants
+        # point back at the word, so typo lookups avoid comparing all words
+        deletes = defaultdict(list)
+        for token in self.tokens:
+            if len(token) >= MIN_TYPO_LENGTH - 1:
+                for variant in _deletions(token) | {token}:
+                    deletes[variant].append(token)
+        self.deletes = dict(deletes)
+
+    @staticmethod
+    def _post(posting, row_id):
+        """Add row_id to a posting list unless this row was already posted"""
+        if not posting or posting[-1] != row_id:
+            posting.append(row_id)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def rows_with_token(self, token):
+        """Return the rows where any column contains the given whole word"""
+        return self.tokens.get(token.lower(), array('I'))
+
+    def candidates(self, query):
+        """Return row ids that may contain the (lowercased) query"""
+        if len(query) < 2:
+            return range(len(self.texts))
+        if len(query) <= GRAM_SIZE:
+            return self.grams.get(query, ())
+
+        postings = []
+        for i in range(len(query) - GRAM_SIZE + 1):
+            posting = self.grams.get(query[i:i + GRAM_SIZE])
+            if posting is None:
+                return ()
+            postings.append(posting)
+
+        # Intersect starting from the rarest trigram
+        postings.sort(key=len)
+        rows = set(postings[0])
+        for posting in postings[1:]:
+            rows.intersection_update(posting)
+            if not rows:
+                break
+        return sorted(rows)
+
+    def fuzzy_rows(self, word):
+        """Return rows containing a word within one edit of word"""
+        words = set()
+        for variant in _deletions(word) | {word}:
+            words.update(self.deletes.get(variant, ()))
+
+        rows = set()
+        for token in words:
+            if _within_one_edit(word, token):
+                rows.update(self.tokens[token])
+        return rows
+
+    def rank(self, query, limit=10, typo_tolerance=True):
+        """Return up to limit (tier, row) pairs for query, best first.
+
+        An exact IATA code comes first, then city prefix, word prefix in any
+        column and plain substring matches, in table order within a tier.
+        If that leaves room, rows one typo away from a single-word query are
+        appended last.
+        """
+        query = query.lower().strip()
+        if not query:
+            return []
+
+        exact_row = self.codes.get(query)
+        word_start = re.compile(r'(?<!\w)' + re.escape(query))
+        matched = self.search(query)
+
+        ranked = []
+        for row in matched:
+            code, city, airport_name, country = self.texts[row]
+            if row == exact_row:
+                tier = EXACT_CODE
+            elif city.startswith(query):
+                tier = CITY_PREFIX
+            elif code.startswith(query) or word_start.search(city) or word_start.search(airport_name) or word_start.search(country):
+                tier = WORD_PREFIX
+            else:
+                tier = SUBSTRING
+            ranked.append((tier, row))
+        results = heapq.nsmallest(limit, ranked)
+
+        if typo_tolerance and len(results) < limit and len(query) >= MIN_TYPO_LENGTH and ' ' not in query:
+            fuzzy = self.fuzzy_rows(query).difference(matched)
+            results += [(ONE_TYPO, row) for row in heapq.nsmallest(limit - len(results), fuzzy)]
+
+        return results
+
+    def search(self, query):
+        """Return ids of rows with a column containing query, in table order"""
+        query = query.lower().strip()
+        if not query:
+            return list(range(len(self.texts)))
+
+        texts = self.texts
+        return [
+            row_id for row_id in self.candidates(query)
+            if any(query in field for field in texts[row_id])
+        ]
+
 class AirportLookup:
-    def __init__(self, csv_path='airport_codes.csv'):
-        """Initialize with airport data from CSV"""
+    def __init__(self, csv_path='airport_codes.csv', snapshot_path=None, coordinates_path='airport_coordinates.csv'):
+        """Initialize with airport data from a snapshot if it is current, else from CSV"""
+        self.table = None
+        self.index = None
+        self.spatial = None
+        self._airports_df = None
+        self.coordinates_path = coordinates_path
+        self.from_snapshot = bool(snapshot_path) and self.load_snapshot(snapshot_path, csv_path)
+        if self.from_snapshot:
+            return
+
         try:
-            self.airports_df = pd.read_csv(csv_path)
-            # Split Airport column into City and Airport name where applicable
-            self.airports_df[['City', 'Airport_Name']] = self.airports_df['Airport'].str.split(',', n=1, expand=True)
-            # Clean up the split results
-            self.airports_df['City'] = self.airports_df['City'].str.strip()
-            self.airports_df['Airport_Name'] = self.airports_df['Airport_Name'].fillna('').str.strip()
+            self.table = AirportTable.from_csv(csv_path)
+            # Build the search index once so lookups only touch candidate rows
+            self.index = AirportIndex(self.table.rows())
         except Exception as e:
             print(f"Error loading airport data: {str(e)}")
-            self.airports_df = None
+            self.table = None
+            self.index = None
+            return
+
+        # Coordinates are optional, search works without them
+        try:
+            if coordinates_path and os.path.exists(coordinates_path):
+                self.table.load_coordinates(coordinates_path)
+        except Exception as e:
+            print(f"Error loading airport coordinates: {str(e)}")
+        self.spatial = SpatialIndex(
+            (row, *position) for row in range(len(self.table))
+            if (position := self.table.coordinates(row)) is not None
+        )
+
+    @property
+    def airports_df(self):
+        """The catalog as a pandas DataFrame, built (and pandas imported) on first use"""
+        if self.table is None:
+            return None
+        if self._airports_df is None:
+            self._airports_df = self.to_dataframe()
+        return self._airports_df
+
+    def to_dataframe(self, airports=None):
+        """Return airports (default: the whole catalog) as a DataFrame"""
+        import pandas as pd
+
+        if airports is None:
+            airports = self.table
+        return pd.DataFrame(
+            [(a.code, a.city, a.airport_name, a.country) for a in airports],
+            columns=SEARCH_COLUMNS
+        )
+
+    def _source_signature(self, csv_path):
+        """Identify the CSV (and coordinates file) a snapshot was built from"""
+        signature = []
+        for path in (csv_path, self.coordinates_path):
+            if path and os.path.exists(path):
+                stat = os.stat(path)
+                signature.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+        return signature
+
+    def save_snapshot(self, snapshot_path, csv_path='airport_codes.csv'):
+        """Write the parsed table and search index to a binary snapshot"""
+        if self.table is None:
+            return False
+
+        payload = {
+            'version': SNAPSHOT_VERSION,
+            'source': self._source_signature(csv_path),
+            'table': self.table,
+            'index': self.index,
+            'spatial': self.spatial,
+        }
+        # Write to a temp file first so readers never see a partial snapshot
+        tmp_path = f"{snapshot_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_path)
+        return True
+
+    def load_snapshot(self, snapshot_path, csv_path='airport_codes.csv'):
+        """Load a snapshot, returning False if it is missing or stale"""
+        try:
+            with open(snapshot_path, 'rb') as f:
+                payload = pickle.load(f)
+            if payload.get('version') != SNAPSHOT_VERSION:
+                return False
+            if os.path.exists(csv_path) and payload.get('source') != self._source_signature(csv_path):
+                return False
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Ignoring unreadable airport snapshot: {str(e)}")
+            return False
+
+        self.table = payload['table']
+        self.index = payload['index']
+        self.spatial = payload['spatial']
+        return True
 
     def search_airports(self, query):
         """Search airports by code, city, airport name, or country"""
-        if self.airports_df is None:
+        if self.table is None:
+            return []
+
+        # Plain substring match on any indexed column, in CSV order
+        return [self.table[row] for row in self.index.search(query)]
+
+    def rank_airports(self, query, limit=10, typo_tolerance=True):
+        """Return the best limit airports for query, best match first"""
+        if self.table is None:
             return []
-            
-        query = query.lower().strip()
-        
-        # Search in all relevant columns
-        matches = self.airports_df[
-            self.airports_df['Code'].str.lower().str.contains(query) |
-            self.airports_df['City'].str.lower().str.contains(query) |
-            self.airports_df['Airport_Name'].str.lower().str.contains(query) |
-            self.airports_df['Country'].str.lower().str.contains(query)
-        ]
-        
-        return matches
+
+        return [self.table[row] for _, row in self.index.rank(query, limit, typo_tolerance)]
+
+    def resolve_many(self, queries, limit=5):
+        """Resolve free-text city/airport strings to IATA codes without prompting.
+
+        Returns one dict per query, in input order, with the best 'code' and
+        'airport' (same shape as get_airport_selection returns), a
+        'confidence' between 0 and 1 and the 'ambiguous' alternatives that
+        scored almost as well. Repeated queries are only resolved once.
+        """
+        resolved = {}
+        results = []
+        for query in queries:
+            key = ' '.join(str(query).lower().split())
+            if key not in resolved:
+                resolved[key] = self._resolve(key, limit)
+            results.append({'query': query, **resolved[key]})
+        return results
+
+    def resolve(self, query, limit=5):
+        """Resolve a single free-text query, see resolve_many"""
+        return self.resolve_many([query], limit)[0]
+
+    def _resolve(self, query, limit):
+        unresolved = {'code': None, 'airport': None, 'confidence': 0.0, 'ambiguous': []}
+        if self.table is None or not query:
+            return unresolved
+
+        embedded = EMBEDDED_CODE.search(query)
+        if embedded and embedded.group(1) in self.index.codes:
+            query = embedded.group(1)
+
+        # Stable sort keeps the ranking order between equal scores
+        scored = sorted(
+            ((self._confidence(query, tier, row), row) for tier, row in self.index.rank(query, limit)),
+            key=lambda pair: -pair[0]
+        )
+        if not scored:
+            return unresolved
+
+        best_score, best_row = scored[0]
+        ambiguous = [row for score, row in scored[1:] if best_score - score <= AMBIGUITY_MARGIN]
+        return {
+            'code': self.table.code(best_row),
+            'airport': self.table[best_row].to_dict(),
+            'confidence': round(best_score / (1 + len(ambiguous)), 3),
+            'ambiguous': [self.table[row].to_dict() for row in ambiguous]
+        }
+
+    def _confidence(self, query, tier, row):
+        """Score how certainly row is what query refers to"""
+        if tier == EXACT_CODE:
+            return TIER_CONFIDENCE[EXACT_CODE]
+        city = self.index.texts[row][1]
+        if city == query:
+            return EXACT_CITY_CONFIDENCE
+        if _place_name(city) == query:
+            return EXACT_PLACE_CONFIDENCE
+        return TIER_CONFIDENCE[tier]
+
+    def nearest_airports(self, latitude, longitude, k=5, max_km=None):
+        """Return up to k (Airport, distance_km) pairs closest to a point"""
+        if self.spatial is None:
+            return []
+
+        return [(self.table[row], distance) for distance, row in self.spatial.nearest(latitude, longitude, k, max_km)]
+
+    def airports_within(self, latitude, longitude, radius_km):
+        """Return all (Airport, distance_km) pairs within radius_km of a point, nearest first"""
+        if self.spatial is None:
+            return []
+
+        return [(self.table[row], distance) for distance, row in self.spatial.within(latitude, longitude, radius_km)]
+
+    def nearby_airports(self, query, k=5, radius_km=None):
+        """Return airports near the best match for query (a code, city or airport name).
+
+        The matched airport itself is excluded, so this lists alternates,
+        e.g. nearby_airports('Rimini', radius_km=150) lists AOI, BLQ and more
+        """
+        if self.spatial is None:
+            return []
+
+        origin = next((airport for airport in self.rank_airports(query, limit=5) if airport.latitude is not None), None)
+        if origin is None:
+            return []
+
+        if radius_km is None:
+            nearby = self.nearest_airports(origin.latitude, origin.longitude, k + 1)
+        else:
+            nearby = self.airports_within(origin.latitude, origin.longitude, radius_km)
+        return [(airport, distance) for airport, distance in nearby if airport.row != origin.row][:k]
 
     def get_airport_selection(self, prompt, departure_info=None):
         """Interactive airport selection process"""
-        if self.airports_df is None:
+        if self.table is None:
             print("Airport data not available. Please enter IATA code directly.")
             return None
             
@@ -59,20 +660,19 @@ class AirportLookup:
                 print("Please enter a search term.")
                 continue
                 
-            matches = self.search_airports(search_term)
+            matches = self.rank_airports(search_term, limit=MAX_SELECTION_RESULTS)
             
             if len(matches) == 0:
                 print("\nNo matching airports found. Press Enter to try again.")
                 input()
                 continue
                 
-            # Display matches with sequential numbering
+            # Display matches with sequential numbering, best match first
             print("\nMatching airports:")
-            for i, (_, row) in enumerate(matches.iterrows(), 1):
-                airport_info = f"{row['City']}"
-                if row['Airport_Name']:
-                    airport_info += f" - {row['Airport_Name']}"
-                print(f"{i}. {airport_info} ({row['Code']}) - {row['Country']}")
+            for i, airport in enumerate(matches, 1):
+                print(f"{i}. {airport.full_name}")
+            if len(matches) == MAX_SELECTION_RESULTS:
+                print(f"\nShowing the best {MAX_SELECTION_RESULTS} matches. Search again (0) with more detail to narrow them down.")
                 
             # Get user selection
             while True:
@@ -83,28 +683,56 @@ class AirportLookup:
                         
                     selection = int(selection)
                     if 1 <= selection <= len(matches):
-                        # Get the selected row using iloc with adjusted index
-                        selected_row = matches.iloc[selection - 1]
-                        selected_code = selected_row['Code']
-                        selected_city = selected_row['City']
-                        selected_airport = selected_row['Airport_Name']
-                        selected_country = selected_row['Country']
-                        
-                        selected_text = f"{selected_city}"
-                        if selected_airport:
-                            selected_text += f" - {selected_airport}"
-                        selected_text += f" ({selected_code}) - {selected_country}"
-                        
-                        print(f"\nSelected: {selected_text}")
-                        
-                        return {
-                            'code': selected_code,
-                            'city': selected_city,
-                            'airport': selected_airport,
-                            'country': selected_country,
-                            'full_name': selected_text
-                        }
+                        selected = matches[selection - 1]
+                        print(f"\nSelected: {selected.full_name}")
+                        return selected.to_dict()
                     else:
                         print("Invalid selection. Please try again.")
                 except ValueError:
                     print("Please enter a valid number.")
+
+# Process-wide airport catalogs, keyed by CSV path. They are read-only once
+# loaded, so every prompt and session can share them.
+_shared_lookups = {}
+_shared_lock = threading.Lock()
+
+def get_airport_lookup(csv_path='airport_codes.csv', reload=False):
+    """Return the shared AirportLookup for csv_path, loading it once.
+
+    Set AIRPORT_SNAPSHOT_PATH to load from (and refresh) a binary snapshot
+    instead of parsing the CSV. Pass reload=True to rebuild after the data
+    file changes.
+    """
+    with _shared_lock:
+        lookup = _shared_lookups.get(csv_path)
+        if lookup is None or reload:
+            snapshot_path = os.getenv('AIRPORT_SNAPSHOT_PATH')
+            lookup = AirportLookup(csv_path, snapshot_path=snapshot_path)
+            if lookup.table is None:
+                # Don't cache a failed load, the next caller should retry
+                return lookup
+            if snapshot_path and not lookup.from_snapshot:
+                try:
+                    lookup.save_snapshot(snapshot_path, csv_path)
+                except OSError as e:
+                    print(f"Could not write airport snapshot: {str(e)}")
+            _shared_lookups[csv_path] = lookup
+    return lookup
+
+def build_snapshot(csv_path='airport_codes.csv', snapshot_path='airport_codes.pkl'):
+    """Parse the CSV, index it and write the snapshot used at startup"""
+    lookup = AirportLookup(csv_path)
+    if not lookup.save_snapshot(snapshot_path, csv_path):
+        return False
+    # Read it back the way startup does, so an unusable snapshot fails the build
+    if not AirportLookup(csv_path, snapshot_path=snapshot_path).from_snapshot:
+        print(f"Error: Airport snapshot {snapshot_path} could not be loaded back")
+        return False
+    print(f"Airport snapshot written to {snapshot_path} ({len(lookup.table)} airports)")
+    return True
+
+if __name__ == "__main__":
+    # Build through the imported module: run as a script, the classes would be
+    # pickled as __main__.AirportTable and no other process could load them
+    import airport_lookup
+    sys.exit(0 if airport_lookup.build_snapshot(*sys.argv[1:3]) else 1)
@@ -0,0 +1,209 @@
+import asyncio
+import threading
+import httpx
+from flight import (AmadeusAPI, amadeus_resilience, flight_cache, flight_search_key,
+                    FLEX_MAX_COMBINATIONS)
+from flight_offers import FlightOffer, OfferStreamParser
+from http_pool import POOL_SIZE, REQUEST_TIMEOUT
+from resilience import TransientError, CircuitOpenError
+from token_generator import TokenError
+
+FLIGHT_OFFERS_PATH = '/v2/shopping/flight-offers'
+
+class AsyncAmadeusAPI(AmadeusAPI):
+    """Awaitable flight search over httpx.
+
+    Shares the request body, ranking, process-wide rate limiter, OAuth token
+    and flight cache with AmadeusAPI, so sync and async searches draw from
+    the same Amadeus quota. The httpx client belongs to the event loop it
+    is used on, so use one instance per loop:
+
+        async with AsyncAmadeusAPI() as amadeus:
+            response = await amadeus.search_flights_async(routes)
+
+    Searches made during planning share one long-lived instance on a
+    background loop instead; see get_async_amadeus_client().
+    """
+
+    def __init__(self):
+        super().__init__()
+        # Requests here are sent without the SDK, so they need the shared token up front
+        if not hasattr(self.amadeus.access_token, '_bearer_token'):
+            raise RuntimeError("Amadeus client has no access token source for async searches")
+        scheme = 'https' if self.amadeus.ssl else 'http'
+        self.http = httpx.AsyncClient(
+            base_url=f"{scheme}://{self.amadeus.host}:{self.amadeus.port}",
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE)
+        )
+        # Searches in progress on this loop, so identical searches share one request
+        self._inflight = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.http.aclose()
+
+    async def search_flights_async(self, flight_routes, adults=1, children=0, infants=0,
+                                   travel_class='ECONOMY', currency='EUR', max_results=20, non_stop=False,
+                                   use_cache=True):
+        """Search for flight offers without blocking the event loop"""
+        args = (flight_routes, adults, children, infants, travel_class, currency, max_results, non_stop)
+        self.travel_class = travel_class
+        if not use_cache:
+            return await self._search_flights_async(*args)
+
+        key = flight_search_key(*args)
+        response = flight_cache.get(key)
+        if response is None:
+            task = self._inflight.get(key)
+            if task is None:
+                task = self._inflight[key] = asyncio.ensure_future(self._load(key, args))
+            # Shielded so one cancelled caller doesn't cancel the search for the others
+            response = await asyncio.shield(task)
+        if response is None:
+            # Upstream failed or its breaker is open: serve whatever is still cached
+            response = flight_cache.peek(key)
+        if response is None:
+            return None
+        # Copy the list so callers can't modify the cached entry
+        return {'data': list(response['data'])}
+
+    async def _load(self, key, args):
+        try:
+            response = await self._search_flights_async(*args)
+            if response is not None:
+                flight_cache.set(key, response)
+            return response
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _search_flights_async(self, flight_routes, adults=1, children=0, infants=0,
+                                    travel_class='ECONOMY', currency='EUR', max_results=20, non_stop=False):
+        """Search for flight offers with one REST call to Amadeus"""
+        try:
+            body = self._search_body(flight_routes, adults, children, infants,
+                                     travel_class, currency, max_results, non_stop)
+
+            # The token is cached process-wide, so this rarely goes to the network
+            bearer_token = await asyncio.to_thread(self.amadeus.access_token._bearer_token)
+
+            # Retried, hedged and bounded by a deadline; see resilience.py
+            selection = await amadeus_resilience.call_async(
+                lambda: self._post_search_async(body, bearer_token, travel_class))
+            if selection is None:
+                return None
+            return {'data': self.selected_offers(selection)}
+
+        except CircuitOpenError as error:
+            print(f"Flight search unavailable: {error}")
+            return None
+        except TokenError as error:
+            print(f"Flight search unavailable, could not authenticate with Amadeus: {error}")
+            return None
+        except TransientError as error:
+            print(f"Error during flight search: {error}")
+            return None
+        except Exception as e:
+            print(f"Error searching flights: {str(e)}")
+            return None
+
+    async def _post_search_async(self, body, bearer_token, travel_class):
+        """One flight-offers request, parsed as it streams in.
+
+        Each offer is projected to a FlightOffer as soon as it has arrived
+        and only the running selection is kept, so the full response is
+        never held in memory. Returns the OfferSelection, or None if
+        Amadeus rejected the request.
+        """
+        selection = self.offer_selection(travel_class)
+        parser = OfferStreamParser()
+        try:
+            async with self.http.stream(
+                'POST',
+                FLIGHT_OFFERS_PATH,
+                json=body,
+                headers={
+                    'Authorization': bearer_token,
+                    'Accept': 'application/json, application/vnd.amadeus+json'
+                }
+            ) as response:
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise TransientError(f"Amadeus returned {response.status_code}")
+                if response.status_code != 200:
+                    await response.aread()
+                    print(f"Error during flight search: [{response.status_code}] {response.text[:200]}")
+                    return None
+
+                # Read to the end even after the offers so the connection can be reused
+                async for chunk in response.aiter_bytes():
+                    for offer in parser.feed(chunk):
+                        selection.add(FlightOffer.from_amadeus(offer))
+        except httpx.HTTPError as error:
+            raise TransientError(f"Amadeus request failed: {error!r}")
+
+        parser.close()
+        return selection
+
+    async def search_many_async(self, searches):
+        """Run several searches (dicts of search_flights_async arguments) concurrently"""
+        return await asyncio.gather(*(self.search_flights_async(**search) for search in searches))
+
+    async def search_flexible_dates_async(self, flight_routes, window_days=3, adults=1, children=0, infants=0,
+                                          travel_class='ECONOMY', currency='EUR', max_results=20, non_stop=False,
+                                          max_combinations=FLEX_MAX_COMBINATIONS):
+        """Awaitable search_flexible_dates; the rate limiter paces the requests instead of a thread pool"""
+        combinations = self._date_combinations(flight_routes, window_days, max_combinations)
+
+        async def search(dates):
+            routes = [dict(route, departure_date=date) for route, date in zip(flight_routes, dates)]
+            return dates, await self.search_flights_async(routes, adults, children, infants,
+                                                          travel_class, currency, max_results, non_stop)
+
+        results = await asyncio.gather(*(search(dates) for dates in combinations))
+        return self._flexible_results(results, travel_class)
+
+_loop = None
+_async_client = None
+_loop_lock = threading.Lock()
+
+def search_loop():
+    """The process-wide event loop searches run on, started on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='flight-search-loop', daemon=True).start()
+    return _loop
+
+def get_async_amadeus_client():
+    """Return the process-wide AsyncAmadeusAPI, which lives on search_loop().
+
+    Kept open for the life of the process, so every search reuses its
+    connections instead of opening a client per search.
+    """
+    global _async_client
+    search_loop()
+    with _loop_lock:
+        if _async_client is None:
+            try:
+                _async_client = AsyncAmadeusAPI()
+            except Exception as e:
+                print(f"Error initializing Amadeus client: {str(e)}")
+                return None
+    return _async_client
+
+def run_on_search_loop(coro):
+    """Run coro on search_loop() and wait for its result; for synchronous callers"""
+    return asyncio.run_coroutine_threadsafe(coro, search_loop()).result()
+
+async def on_search_loop(coro):
+    """Await coro on search_loop(), wherever the caller's own loop is"""
+    loop = search_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
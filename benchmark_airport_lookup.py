@@ -0,0 +1,66 @@
+import os
+import random
+import string
+import sys
+import tempfile
+import timeit
+import pandas as pd
+from airport_lookup import AirportLookup
+
+# Queries typed at the airport prompt: codes, partial cities, countries, misses
+QUERIES = ['lis', 'LHR', 'san', 'new york', 'frankfurt', 'united', 'ge', 'a', 'zzzq', 'international']
+
+def legacy_search(airports_df, query):
+    """The original full-column scan, kept here as the baseline"""
+    query = query.lower().strip()
+    return airports_df[
+        airports_df['Code'].str.lower().str.contains(query) |
+        airports_df['City'].str.lower().str.contains(query) |
+        airports_df['Airport_Name'].str.lower().str.contains(query) |
+        airports_df['Country'].str.lower().str.contains(query)
+    ]
+
+def write_scaled_csv(source_csv, rows, path):
+    """Write a synthetic airport CSV of the given size based on the real one"""
+    source = pd.read_csv(source_csv)
+    rng = random.Random(42)
+    copies = []
+    for i in range(-(-rows // len(source))):
+        copy = source.copy()
+        if i:
+            # Perturb codes and city names so the copies are not identical
+            copy['Code'] = [''.join(rng.choices(string.ascii_uppercase, k=3)) for _ in range(len(copy))]
+            copy['Airport'] = copy['Airport'].str.replace(',', f' {i},', n=1, regex=False)
+        copies.append(copy)
+    pd.concat(copies).head(rows).to_csv(path, index=False)
+
+def time_call(func, repeat=3, number=10):
+    """Return the best per-call time in milliseconds"""
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number * 1000
+
+def run(rows, csv_path):
+    build_start = timeit.default_timer()
+    lookup = AirportLookup(csv_path)
+    build_ms = (timeit.default_timer() - build_start) * 1000
+
+    print(f"\n{rows} rows (lookup + index built in {build_ms:.0f} ms)")
+    print(f"{'query':<16}{'matches':>9}{'scan ms':>12}{'index ms':>12}{'speedup':>10}")
+    for query in QUERIES:
+        old = legacy_search(lookup.airports_df, query)
+        new = lookup.search_airports(query)
+        assert list(old.index) == [airport.row for airport in new], f"Result mismatch for {query!r}"
+
+        scan_ms = time_call(lambda: legacy_search(lookup.airports_df, query))
+        index_ms = time_call(lambda: lookup.search_airports(query))
+        print(f"{query:<16}{len(new):>9}{scan_ms:>12.3f}{index_ms:>12.3f}{scan_ms / index_ms:>9.1f}x")
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [2000, 70000]
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            csv_path = os.path.join(tmp, f'airports_{rows}.csv')
+            write_scaled_csv('airport_codes.csv', rows, csv_path)
+            run(rows, csv_path)
+
+if __name__ == "__main__":
+    main()
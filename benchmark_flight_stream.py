@@ -0,0 +1,95 @@
+import sys
+import json
+import time
+import tracemalloc
+from benchmark_sort_flights import make_response
+from flight_offers import FlightOffer, OfferStreamParser, normalize_offers
+from flight_ranking import OfferSelection, select_offers
+
+PER_OBJECTIVE = [('price', 2), ('duration', 2)]
+
+def make_payload(size, travelers=3):
+    """A response body shaped like Amadeus's, with the fields we never read"""
+    offers = make_response(size)
+    for i, offer in enumerate(offers):
+        segment_count = sum(len(itinerary['segments']) for itinerary in offer['itineraries'])
+        offer.update({
+            'type': 'flight-offer',
+            'id': str(i + 1),
+            'source': 'GDS',
+            'lastTicketingDate': '2026-11-01',
+            'numberOfBookableSeats': 9,
+            'validatingAirlineCodes': ['TP'],
+            'pricingOptions': {'fareType': ['PUBLISHED'], 'includedCheckedBagsOnly': True},
+        })
+        offer['price'].update({'currency': 'EUR', 'base': offer['price']['total'], 'grandTotal': offer['price']['total'],
+                               'fees': [{'amount': '0.00', 'type': 'SUPPLIER'}, {'amount': '0.00', 'type': 'TICKETING'}]})
+        offer['travelerPricings'] = [{
+            'travelerId': str(t + 1),
+            'fareOption': 'STANDARD',
+            'travelerType': 'ADULT',
+            'price': {'currency': 'EUR', 'total': offer['price']['total'], 'base': offer['price']['total']},
+            'fareDetailsBySegment': [{
+                'segmentId': str(s + 1),
+                'cabin': offer['travelerPricings'][0]['fareDetailsBySegment'][0]['cabin'],
+                'fareBasis': 'OLOWTP12',
+                'brandedFare': 'LIGHT',
+                'class': 'O',
+                'includedCheckedBags': {'quantity': 0},
+            } for s in range(segment_count)]
+        } for t in range(travelers)]
+    return json.dumps({
+        'meta': {'count': size, 'links': {'self': 'https://test.api.amadeus.com/v2/shopping/flight-offers'}},
+        'data': offers,
+        'dictionaries': {'carriers': {'TP': 'TAP PORTUGAL', 'LH': 'LUFTHANSA'}, 'currencies': {'EUR': 'EURO'}},
+    }).encode('utf-8')
+
+def chunks(payload, size):
+    for start in range(0, len(payload), size):
+        yield payload[start:start + size]
+
+def parse_whole(payload):
+    """The old path: decode everything, normalize every offer, then select"""
+    offers = normalize_offers(json.loads(payload)['data'])
+    filtered = [offer for offer in offers if offer.cabin == 'ECONOMY'] or offers
+    return [offer for _, offer in select_offers(filtered, PER_OBJECTIVE)]
+
+def parse_streaming(payload, chunk_size=16384):
+    selection = OfferSelection(PER_OBJECTIVE, cabin='ECONOMY')
+    parser = OfferStreamParser()
+    for chunk in chunks(payload, chunk_size):
+        for offer in parser.feed(chunk):
+            selection.add(FlightOffer.from_amadeus(offer))
+    parser.close()
+    return [offer for _, offer in selection.results()]
+
+def measure(func, payload):
+    """Return (result, seconds, peak MiB) for one call"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(payload)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2 ** 20
+
+def key(offers):
+    return [(offer.price, offer.duration) for offer in offers]
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [50, 250]
+    for size in sizes:
+        payload = make_payload(size)
+        expected = key(parse_whole(payload))
+        # Chunk boundaries anywhere, including inside strings and numbers
+        for chunk_size in (1, 7, 1000, 65536):
+            assert key(parse_streaming(payload, chunk_size)) == expected
+
+        _, whole_s, whole_mb = measure(parse_whole, payload)
+        _, stream_s, stream_mb = measure(parse_streaming, payload)
+        print(f"\n{size} offers, {len(payload) / 2 ** 20:.1f} MiB response")
+        print(f"json.loads + select   {whole_s * 1000:8.1f} ms  peak {whole_mb:6.2f} MiB")
+        print(f"streaming top-k       {stream_s * 1000:8.1f} ms  peak {stream_mb:6.2f} MiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+import subprocess
+
+# What each entry point imports before it can show anything
+TARGETS = ['interface', 'main', 'my_crew', 'retrieve_plan', 'database']
+TOP_MODULES = 8
+
+def import_profile(module):
+    """Run `python -X importtime -c 'import module'` in a fresh interpreter.
+
+    Returns (wall seconds, {module: cumulative microseconds}).
+    """
+    env = dict(os.environ, PYTHONWARNINGS='ignore')
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, total, name = line[len('import time:'):].split('|')
+        # Each module is reported once, when its import finishes
+        cumulative.setdefault(name.strip(), int(total))
+    return elapsed, cumulative
+
+def top_level(cumulative, module):
+    """Packages the import pulled in, heaviest first"""
+    packages = {}
+    for name, total in cumulative.items():
+        root = name.split('.')[0]
+        if root != module:
+            packages[root] = max(packages.get(root, 0), total)
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)
+
+def main():
+    targets = sys.argv[1:] or TARGETS
+    for module in targets:
+        # The first run pays for writing .pyc files; time the second
+        import_profile(module)
+        elapsed, cumulative = import_profile(module)
+        print(f"\nimport {module}: {elapsed * 1000:.0f} ms wall, "
+              f"{cumulative.get(module, 0) / 1000:.0f} ms importing")
+        for name, total in top_level(cumulative, module)[:TOP_MODULES]:
+            print(f"  {name:28} {total / 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import sys
+from benchmark_sort_flights import make_response
+from flight_offers import normalize_offers
+from flight_ranking import OBJECTIVE_LABELS, select_offers
+from main import format_flight_options, format_trip_info
+from my_crew import FlightOption
+from prompt_encoding import TASK_VIEWS, task_inputs, count_tokens
+
+def make_flight_options(per_objective=2):
+    offers = normalize_offers(make_response(250))
+    selected = select_offers(offers, [('price', per_objective), ('duration', per_objective)])
+    return [FlightOption(**offer.with_label(OBJECTIVE_LABELS[objective]).option_fields('economy'))
+            for objective, offer in selected]
+
+def airport(code, city, name):
+    return {'code': code, 'city': city, 'full_name': f"{name} ({code}), {city}"}
+
+def make_trip(stops=3):
+    """A multi-city trip from Lisbon through `stops` cities and back"""
+    cities = [airport('CDG', 'Paris', 'Charles de Gaulle'), airport('FCO', 'Rome', 'Fiumicino'),
+              airport('BER', 'Berlin', 'Brandenburg'), airport('AMS', 'Amsterdam', 'Schiphol')][:stops]
+    home = airport('LIS', 'Lisbon', 'Humberto Delgado')
+    path = [home] + cities + [home]
+    routes = []
+    for i, (origin, destination) in enumerate(zip(path, path[1:])):
+        route = {'origin': origin['code'], 'destination': destination['code'],
+                 'departure_date': f"2026-11-{1 + 3 * i:02d}",
+                 'origin_details': origin, 'destination_details': destination}
+        if i < stops:
+            route['stay_duration'] = 3
+        routes.append(route)
+    return {
+        'trip_type': 'multi-city',
+        'flight_routes': routes,
+        'adults': 2, 'children': 1, 'infants': 0,
+        'travelers': [{'name': 'Ana Silva', 'type': 'ADT'}, {'name': 'Rui Silva', 'type': 'ADT'},
+                      {'name': 'Eva Silva', 'type': 'CHD'}],
+        'email': 'ana@example.com',
+    }
+
+def main():
+    stops = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    trip_info = make_trip(stops)
+    hotel_locations = [{'city': route['destination_details']['city'], 'location': 'city centre, near the metro'}
+                       for route in trip_info['flight_routes'][:-1]]
+    flight_options = make_flight_options()
+    inputs = dict(trip_info, hotel_locations=hotel_locations, flight_options=flight_options,
+                  flight_options_text=format_flight_options(flight_options),
+                  trip_details_text=format_trip_info(trip_info, hotel_locations))
+
+    def tokens(values):
+        return count_tokens(values['flight_options_text']) + count_tokens(values['trip_details_text'])
+
+    verbose = tokens(inputs)
+    print(f"{stops}-stop trip, {len(flight_options)} flight options; tokens added to each task's prompt")
+    print(f"{'task':40} {'view':>9} {'verbose':>8} {'compact':>8}")
+    total_verbose = total_compact = 0
+    for task_name, view in TASK_VIEWS.items():
+        compact = tokens(task_inputs(inputs, task_name))
+        total_verbose += verbose
+        total_compact += compact
+        print(f"{task_name:40} {view:>9} {verbose:>8} {compact:>8}")
+    print(f"{'total':40} {'':>9} {total_verbose:>8} {total_compact:>8}  ({total_compact / total_verbose:.0%})")
+
+if __name__ == "__main__":
+    main()
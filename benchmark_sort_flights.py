@@ -0,0 +1,169 @@
+import sys
+import random
+import timeit
+from datetime import datetime, timedelta
+from flight_offers import normalize_offers, parse_iso_duration, parse_timestamp
+from flight_ranking import OBJECTIVE_LABELS, select_offers, pareto_front
+
+CABINS = ['ECONOMY', 'ECONOMY', 'ECONOMY', 'BUSINESS']
+AIRPORTS = ['LIS', 'MAD', 'FRA', 'CDG', 'AMS', 'ZRH', 'MUC', 'LHR', 'JFK']
+
+def make_segment(rng, origin, destination, departure):
+    minutes = rng.randint(45, 600)
+    arrival = departure + timedelta(minutes=minutes)
+    return {
+        'departure': {'iataCode': origin, 'at': departure.isoformat()},
+        'arrival': {'iataCode': destination, 'at': arrival.isoformat()},
+        'carrierCode': rng.choice(['TP', 'LH', 'AF', 'KL', 'BA']),
+        'number': str(rng.randint(100, 9999)),
+        'duration': f"PT{minutes // 60}H{minutes % 60}M",
+    }, arrival
+
+def make_routing(rng, origin, destination, date):
+    """One way of flying a leg: 0-2 stops with realistic connection gaps"""
+    stops = rng.choice([0, 0, 1, 1, 2])
+    hops = [origin] + rng.sample([a for a in AIRPORTS if a not in (origin, destination)], stops) + [destination]
+    departure = date + timedelta(minutes=rng.randint(300, 1300))
+    segments = []
+    for hop_from, hop_to in zip(hops, hops[1:]):
+        segment, arrival = make_segment(rng, hop_from, hop_to, departure)
+        segments.append(segment)
+        departure = arrival + timedelta(minutes=rng.randint(40, 400))
+    return segments
+
+def make_offer(rng, routings):
+    """A synthetic Amadeus offer combining one routing per leg with a fare"""
+    itineraries = [{'segments': rng.choice(leg_routings)} for leg_routings in routings]
+    segment_count = sum(len(itinerary['segments']) for itinerary in itineraries)
+    cabin = rng.choice(CABINS)
+    return {
+        'price': {'total': f"{rng.uniform(80, 2500):.2f}"},
+        'itineraries': itineraries,
+        'travelerPricings': [{'fareDetailsBySegment': [{'cabin': cabin}] * segment_count}],
+    }
+
+def make_response(size=250, seed=7, routings_per_leg=40):
+    """Like real responses, many offers share routings and differ in fare"""
+    rng = random.Random(seed)
+    start = datetime(2026, 11, 14)
+    legs = [('LIS', 'JFK', start), ('JFK', 'LIS', start + timedelta(days=7))]
+    routings = [[make_routing(rng, *leg) for _ in range(routings_per_leg)] for leg in legs]
+    return [make_offer(rng, routings) for _ in range(size)]
+
+def legacy_parse_duration(duration_str):
+    duration = duration_str[2:]
+    hours = 0
+    minutes = 0
+    if 'H' in duration:
+        h_index = duration.index('H')
+        hours = int(duration[:h_index])
+        duration = duration[h_index + 1:]
+    if 'M' in duration:
+        m_index = duration.index('M')
+        minutes = int(duration[:m_index])
+    return hours * 60 + minutes
+
+def legacy_total_duration(flight):
+    total_minutes = 0
+    for itinerary in flight['itineraries']:
+        for segment in itinerary['segments']:
+            total_minutes += legacy_parse_duration(segment['duration'])
+        for i in range(len(itinerary['segments']) - 1):
+            arrival = datetime.fromisoformat(itinerary['segments'][i]['arrival']['at'].replace('Z', '+00:00'))
+            departure = datetime.fromisoformat(itinerary['segments'][i + 1]['departure']['at'].replace('Z', '+00:00'))
+            total_minutes += int((departure - arrival).total_seconds() / 60)
+    return total_minutes
+
+def legacy_sort_flights(flights, travel_class='ECONOMY'):
+    """The original sort_flights, kept here as the baseline"""
+    filtered_flights = [f for f in flights if f['travelerPricings'][0]['fareDetailsBySegment'][0]['cabin'] == travel_class]
+    if not filtered_flights:
+        filtered_flights = flights
+    price_sorted = sorted(filtered_flights, key=lambda x: float(x['price']['total']))
+    duration_sorted = sorted(filtered_flights, key=lambda x: legacy_total_duration(x))
+    sorted_flights = price_sorted[:2]
+    for flight in duration_sorted[:2]:
+        if flight not in sorted_flights:
+            sorted_flights.append(flight)
+    return sorted_flights
+
+def legacy_flight_options(flights, travel_class='ECONOMY'):
+    """The original my_crew.search_flights loop: sort, re-parse and rebuild segments"""
+    response = {'data': legacy_sort_flights(flights, travel_class)}
+    options = []
+    for offer in response['data']:
+        segments = []
+        for itinerary in offer['itineraries']:
+            for segment in itinerary['segments']:
+                segments.append({
+                    'origin': segment['departure']['iataCode'],
+                    'destination': segment['arrival']['iataCode'],
+                    'departure_time': segment['departure']['at'],
+                    'arrival_time': segment['arrival']['at'],
+                    'duration': segment['duration'],
+                    'carrier': segment['carrierCode'],
+                    'flight_number': f"{segment['carrierCode']}{segment['number']}"
+                })
+        label = 'cheapest' if offer in response['data'][:2] else 'fastest'
+        options.append((label, float(offer['price']['total']), segments, legacy_total_duration(offer)))
+    return options
+
+def normalized_flight_options(offers, travel_class='ECONOMY'):
+    """The same options built from normalized records"""
+    options = []
+    filtered_offers = [offer for offer in offers if offer.cabin == travel_class] or offers
+    for objective, offer in select_offers(filtered_offers, [('price', 2), ('duration', 2)]):
+        options.append((OBJECTIVE_LABELS[objective], offer.price, offer.segment_dicts(), offer.duration))
+    return options
+
+def ranked_sort_flights(flights, travel_class='ECONOMY', pareto=False):
+    """Same filtering as AmadeusAPI.sort_flights, on normalized offers"""
+    offers = normalize_offers(flights)
+    filtered_offers = [offer for offer in offers if offer.cabin == travel_class]
+    if pareto:
+        return pareto_front(filtered_offers or offers)
+    return [offer for _, offer in select_offers(filtered_offers or offers, [('price', 2), ('duration', 2)])]
+
+def cold(func):
+    """Run func with empty parse caches, as for a response never seen before"""
+    def run():
+        parse_iso_duration.cache_clear()
+        parse_timestamp.cache_clear()
+        return func()
+    return run
+
+def time_call(func, repeat=5, number=50):
+    """Return the best per-call time in milliseconds"""
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number * 1000
+
+def cold_flight_options(flights, travel_class='ECONOMY'):
+    """Options straight from a raw response: ranking keys, top-k, then segments for the selected"""
+    return normalized_flight_options(normalize_offers(flights), travel_class)
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [250]
+    for size in sizes:
+        offers = make_response(size)
+        expected = [(float(o['price']['total']), legacy_total_duration(o)) for o in legacy_sort_flights(offers)]
+        assert expected == [(o.price, o.duration) for o in ranked_sort_flights(offers)]
+        assert legacy_flight_options(offers) == cold_flight_options(offers)
+
+        # Every timing starts from the raw response with empty parse caches
+        legacy_ms = time_call(lambda: legacy_sort_flights(offers))
+        ranked_ms = time_call(cold(lambda: ranked_sort_flights(offers)))
+        pareto_ms = time_call(cold(lambda: ranked_sort_flights(offers, pareto=True)))
+        normalize_ms = time_call(cold(lambda: normalize_offers(offers)))
+        legacy_options_ms = time_call(lambda: legacy_flight_options(offers))
+        options_ms = time_call(cold(lambda: cold_flight_options(offers)))
+        front = ranked_sort_flights(offers, pareto=True)
+
+        print(f"\n{size} offers")
+        print(f"legacy sort_flights   {legacy_ms:8.3f} ms")
+        print(f"ranking keys + top-k  {ranked_ms:8.3f} ms  ({legacy_ms / ranked_ms:.1f}x)")
+        print(f"ranking keys + pareto {pareto_ms:8.3f} ms  ({len(front)} offers on the front)")
+        print(f"ranking keys only     {normalize_ms:8.3f} ms")
+        print(f"legacy options        {legacy_options_ms:8.3f} ms  (sort, re-parse, rebuild segments)")
+        print(f"options               {options_ms:8.3f} ms  ({legacy_options_ms / options_ms:.1f}x, segments for the selected only)")
+
+if __name__ == "__main__":
+    main()
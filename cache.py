@@ -0,0 +1,166 @@
+import time
+import threading
+from collections import OrderedDict
+
+class _PendingLoad:
+    """Result slot for a load that other threads are waiting on"""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self.value = None
+
+    def resolve(self, value):
+        self.value = value
+        self._done.set()
+
+    def wait(self):
+        self._done.wait()
+        return self.value
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a TTL.
+
+    Entries younger than ttl are fresh. Entries younger than ttl + stale_ttl
+    are stale: get_or_load serves them immediately and refreshes them in the
+    background (stale-while-revalidate). Anything older is dropped.
+    """
+
+    def __init__(self, maxsize=128, ttl=300, stale_ttl=0, name="cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.name = name
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        # Loads in progress, so concurrent misses for one key share a single call
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'refreshes': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'coalesced': 0,
+        }
+
+    def _lookup(self, key, now):
+        """Return (value, is_stale) or None; caller holds the lock"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, stored_at = entry
+        age = now - stored_at
+        if age > self.ttl + self.stale_ttl:
+            del self._entries[key]
+            self._stats['expirations'] += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return value, age > self.ttl
+
+    def get(self, key, default=None):
+        """Return the cached value for key if it is still fresh"""
+        with self._lock:
+            found = self._lookup(key, time.monotonic())
+            if found is None or found[1]:
+                self._stats['misses'] += 1
+                return default
+            self._stats['hits'] += 1
+            return found[0]
+
+    def peek(self, key, default=None):
+        """Return the cached value for key, fresh or stale, without counting a lookup"""
+        with self._lock:
+            found = self._lookup(key, time.monotonic())
+            return default if found is None else found[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, key=None):
+        """Drop one entry, or everything when key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for key, calling loader() on a miss.
+
+        Concurrent misses for the same key wait for one loader call instead
+        of each calling it. Results of None are treated as failures and are
+        not cached.
+        """
+        with self._lock:
+            found = self._lookup(key, time.monotonic())
+            if found is not None:
+                value, is_stale = found
+                if not is_stale:
+                    self._stats['hits'] += 1
+                    return value
+                self._stats['stale_hits'] += 1
+                refresh = key not in self._refreshing
+                if refresh:
+                    self._refreshing.add(key)
+            else:
+                self._stats['misses'] += 1
+                pending = self._inflight.get(key)
+                is_leader = pending is None
+                if is_leader:
+                    pending = self._inflight[key] = _PendingLoad()
+                else:
+                    self._stats['coalesced'] += 1
+
+        if found is not None:
+            if refresh:
+                threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+            return value
+
+        if not is_leader:
+            return pending.wait()
+
+        value = None
+        try:
+            value = loader()
+            if value is not None:
+                self.set(key, value)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending.resolve(value)
+        return value
+
+    def _refresh(self, key, loader):
+        """Reload a stale entry in the background"""
+        try:
+            value = loader()
+            if value is not None:
+                self.set(key, value)
+                with self._lock:
+                    self._stats['refreshes'] += 1
+        except Exception as e:
+            print(f"Error refreshing {self.name} entry: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def stats(self):
+        """Return hit/miss counters plus the current size and hit rate"""
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries))
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['stale_hits']) / lookups, 3) if lookups else 0.0
+        return stats
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
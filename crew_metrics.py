@@ -0,0 +1,294 @@
+import os
+import sys
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Print each plan's per-task table when it finishes
+CREW_METRICS_REPORT = os.getenv('CREW_METRICS_REPORT', 'false').lower() == 'true'
+
+# Work done outside any task, such as the flight search before the crew runs
+UNATTRIBUTED = 'other'
+
+# The plan being recorded and the task running, per thread. Threads start
+# with an empty context, so work handed to one must run in a copy of the
+# caller's (contextvars.copy_context().run) to be counted for its plan
+_plan = contextvars.ContextVar('crew_metrics_plan', default=None)
+_task = contextvars.ContextVar('crew_metrics_task', default=(UNATTRIBUTED, None))
+_installed = False
+
+def _new_task(task_name, agent):
+    return {
+        'task': task_name,
+        'agent': agent,
+        'runs': 0,
+        'wall_seconds': 0.0,
+        'llm_calls': 0,
+        'llm_seconds': 0.0,
+        'prompt_tokens': 0,
+        'completion_tokens': 0,
+        'cost_usd': 0.0,
+        'tools': {},
+    }
+
+class PlanMetrics:
+    """Wall time, LLM usage and tool calls of one plan, per task.
+
+    Tasks of the same name (one per stop when research fans out) are
+    summed, so wall_seconds can exceed the plan's own wall time.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self.wall_seconds = None
+
+    def _task(self, task_name, agent):
+        """The counters for task_name; caller holds the lock"""
+        task = self._tasks.get(task_name)
+        if task is None:
+            task = self._tasks[task_name] = _new_task(task_name, agent)
+        return task
+
+    def record_task(self, task_name, agent, seconds):
+        with self._lock:
+            task = self._task(task_name, agent)
+            task['runs'] += 1
+            task['wall_seconds'] += seconds
+
+    def record_llm(self, task_name, agent, seconds, prompt_tokens, completion_tokens, cost):
+        with self._lock:
+            task = self._task(task_name, agent)
+            task['llm_calls'] += 1
+            task['llm_seconds'] += seconds
+            task['prompt_tokens'] += prompt_tokens
+            task['completion_tokens'] += completion_tokens
+            task['cost_usd'] += cost
+
+    def _tool(self, task_name, agent, tool):
+        """The counters for one tool of task_name; caller holds the lock"""
+        tools = self._task(task_name, agent)['tools']
+        return tools.setdefault(tool, {'tool': tool, 'calls': 0, 'seconds': 0.0, 'errors': 0, 'cache_hits': 0})
+
+    def record_tool(self, task_name, agent, tool, seconds, failed):
+        with self._lock:
+            counts = self._tool(task_name, agent, tool)
+            counts['calls'] += 1
+            counts['seconds'] += seconds
+            counts['errors'] += int(failed)
+
+    def record_tool_hit(self, task_name, agent, tool):
+        with self._lock:
+            self._tool(task_name, agent, tool)['cache_hits'] += 1
+
+    def finish(self):
+        self.wall_seconds = time.monotonic() - self._started
+
+    def to_dict(self):
+        """The plan's metrics as stored with the plan document"""
+        with self._lock:
+            tasks = []
+            for task in self._tasks.values():
+                task = dict(task, tools=[dict(counts, seconds=round(counts['seconds'], 3))
+                                         for counts in task['tools'].values()])
+                for field in ('wall_seconds', 'llm_seconds'):
+                    task[field] = round(task[field], 3)
+                task['cost_usd'] = round(task['cost_usd'], 6)
+                tasks.append(task)
+        totals = {field: sum(task[field] for task in tasks)
+                  for field in ('llm_calls', 'prompt_tokens', 'completion_tokens', 'cost_usd')}
+        totals['cost_usd'] = round(totals['cost_usd'], 6)
+        totals['tool_calls'] = sum(tool['calls'] for task in tasks for tool in task['tools'])
+        totals['tool_cache_hits'] = sum(tool['cache_hits'] for task in tasks for tool in task['tools'])
+        wall_seconds = self.wall_seconds if self.wall_seconds is not None else time.monotonic() - self._started
+        return dict(totals, wall_seconds=round(wall_seconds, 3), tasks=tasks)
+
+def start_plan():
+    """Start collecting metrics for a plan in the current context.
+
+    Calls made in this context, and in copies of it, until finish_plan()
+    count towards it; other plans running at the same time are separate.
+    """
+    install()
+    plan = PlanMetrics()
+    _plan.set(plan)
+    return plan
+
+def finish_plan():
+    """Stop collecting and return the plan's metrics as a dict, or None if none were started"""
+    plan = _plan.get()
+    if plan is None:
+        return None
+    _plan.set(None)
+    plan.finish()
+    return plan.to_dict()
+
+def _current():
+    """(plan metrics or None, task name, agent) for the calling context"""
+    task_name, agent = _task.get()
+    return _plan.get(), task_name, agent
+
+@contextmanager
+def task_scope(task_name, agent):
+    """Attribute LLM and tool calls made in this context to task_name, and time the task"""
+    token = _task.set((task_name, agent))
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        plan = _plan.get()
+        if plan is not None:
+            plan.record_task(task_name, agent, time.monotonic() - started)
+        _task.reset(token)
+
+@contextmanager
+def tool_call(tool):
+    """Time one tool call for the task running in this context; wrap only calls that really run"""
+    started = time.monotonic()
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        plan, task_name, agent = _current()
+        if plan is not None:
+            plan.record_tool(task_name, agent, tool, time.monotonic() - started, failed)
+
+def tool_cache_hit(tool):
+    """Count a tool result served from cache for the task running in this context"""
+    plan, task_name, agent = _current()
+    if plan is not None:
+        plan.record_tool_hit(task_name, agent, tool)
+
+def _usage_cost(model, usage):
+    """(prompt tokens, completion tokens, estimated USD) from a litellm usage block"""
+    if usage is None:
+        return 0, 0, 0.0
+    prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+    completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+    try:
+        import litellm
+        prompt_cost, completion_cost = litellm.cost_per_token(
+            model=model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        cost = prompt_cost + completion_cost
+    except Exception:
+        # Models without a published price are counted at zero cost
+        cost = 0.0
+    return prompt_tokens, completion_tokens, cost
+
+def _record_llm(model, started, usage):
+    plan, task_name, agent = _current()
+    if plan is not None:
+        plan.record_llm(task_name, agent, time.monotonic() - started, *_usage_cost(model, usage))
+
+def _streamed(chunks, model, started):
+    """Pass a streamed completion through, recording it once the last chunk has arrived"""
+    usage = None
+    try:
+        for chunk in chunks:
+            # Sent on the final chunk when stream_options asks for it
+            usage = getattr(chunk, 'usage', None) or usage
+            yield chunk
+    finally:
+        _record_llm(model, started, usage)
+
+def _instrumented(completion):
+    def instrumented_completion(*args, **kwargs):
+        model = kwargs.get('model') or (args[0] if args else None)
+        started = time.monotonic()
+        response = completion(*args, **kwargs)
+        if kwargs.get('stream'):
+            return _streamed(response, model, started)
+        _record_llm(model, started, getattr(response, 'usage', None))
+        return response
+    instrumented_completion.__wrapped__ = completion
+    return instrumented_completion
+
+def install():
+    """Count every litellm completion, which is how crewai agents call their LLM"""
+    global _installed
+    if _installed:
+        return
+    # Imported here so the planner's entry points don't pay for litellm until a plan runs
+    import litellm
+    _installed = True
+    litellm.completion = _instrumented(litellm.completion)
+
+def print_plan_report(metrics):
+    print(f"\n{'task':38} {'runs':>4} {'wall s':>8} {'llm':>4} {'in tok':>8} {'out tok':>8} {'tools':>5} {'tool s':>7} "
+          f"{'cached':>6} {'USD':>8}")
+    for task in metrics['tasks']:
+        tool_calls = sum(tool['calls'] for tool in task['tools'])
+        tool_seconds = sum(tool['seconds'] for tool in task['tools'])
+        cache_hits = sum(tool['cache_hits'] for tool in task['tools'])
+        print(f"{task['task']:38} {task['runs']:>4} {task['wall_seconds']:>8.1f} {task['llm_calls']:>4} "
+              f"{task['prompt_tokens']:>8} {task['completion_tokens']:>8} {tool_calls:>5} {tool_seconds:>7.1f} "
+              f"{cache_hits:>6} {task['cost_usd']:>8.4f}")
+    print(f"{'plan':38} {'':>4} {metrics['wall_seconds']:>8.1f} {metrics['llm_calls']:>4} "
+          f"{metrics['prompt_tokens']:>8} {metrics['completion_tokens']:>8} {metrics['tool_calls']:>5} {'':>7} "
+          f"{metrics['tool_cache_hits']:>6} {metrics['cost_usd']:>8.4f}")
+
+def aggregate_metrics(collection, days=7):
+    """Per-task averages and totals over the plans stored in the last `days` days"""
+    since = datetime.now() - timedelta(days=days)
+    plans = collection.find({'timestamp': {'$gte': since}, 'crew_metrics': {'$exists': True}},
+                            {'crew_metrics': 1})
+
+    summary = {'plans': 0, 'wall_seconds': 0.0, 'cost_usd': 0.0, 'tasks': {}, 'tools': {}}
+    for plan in plans:
+        metrics = plan.get('crew_metrics')
+        if not metrics:
+            continue
+        summary['plans'] += 1
+        summary['wall_seconds'] += metrics['wall_seconds']
+        summary['cost_usd'] += metrics['cost_usd']
+        for task in metrics['tasks']:
+            totals = summary['tasks'].setdefault(task['task'], dict(_new_task(task['task'], task['agent']), plans=0))
+            totals['plans'] += 1
+            for field in ('runs', 'wall_seconds', 'llm_calls', 'llm_seconds', 'prompt_tokens',
+                          'completion_tokens', 'cost_usd'):
+                totals[field] += task[field]
+            for tool in task['tools']:
+                counts = summary['tools'].setdefault(tool['tool'],
+                                                     {'calls': 0, 'seconds': 0.0, 'errors': 0, 'cache_hits': 0})
+                for field in ('calls', 'seconds', 'errors'):
+                    counts[field] += tool[field]
+                # Plans stored before hits were counted have none
+                counts['cache_hits'] += tool.get('cache_hits', 0)
+    for counts in summary['tools'].values():
+        counts['avg_seconds'] = round(counts['seconds'] / counts['calls'], 3) if counts['calls'] else 0.0
+    return summary
+
+def print_aggregate(summary):
+    plans = summary['plans']
+    if not plans:
+        print("No plans with crew metrics in that period")
+        return
+    print(f"{plans} plans, {summary['wall_seconds'] / plans:.1f} s and ${summary['cost_usd'] / plans:.4f} per plan\n")
+    print(f"{'task (per plan)':38} {'wall s':>8} {'llm':>5} {'in tok':>8} {'out tok':>8} {'USD':>8} {'share':>6}")
+    total_cost = summary['cost_usd'] or 1
+    for name, task in sorted(summary['tasks'].items(), key=lambda item: item[1]['wall_seconds'], reverse=True):
+        n = task['plans']
+        print(f"{name:38} {task['wall_seconds'] / n:>8.1f} {task['llm_calls'] / n:>5.1f} "
+              f"{task['prompt_tokens'] / n:>8.0f} {task['completion_tokens'] / n:>8.0f} "
+              f"{task['cost_usd'] / n:>8.4f} {task['cost_usd'] / total_cost:>6.0%}")
+    if summary['tools']:
+        print(f"\n{'tool':38} {'calls':>8} {'avg s':>8} {'errors':>8} {'cached':>8}")
+        for name, tool in summary['tools'].items():
+            print(f"{name:38} {tool['calls']:>8} {tool['avg_seconds']:>8.2f} {tool['errors']:>8} {tool['cache_hits']:>8}")
+
+if __name__ == "__main__":
+    import replay
+    replay.install()
+    from database import connect_to_mongodb
+    collection = connect_to_mongodb()
+    if collection is None:
+        print("Error: Could not connect to database")
+        sys.exit(1)
+    print_aggregate(aggregate_metrics(collection, days=int(sys.argv[1]) if len(sys.argv) > 1 else 7))
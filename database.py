@@ -1,7 +1,9 @@
 from pymongo import MongoClient
 from datetime import datetime
 import os
+import threading
 from dotenv import load_dotenv
+import replay
 
 # Load environment variables
 load_dotenv()
@@ -12,10 +14,19 @@ def serialize_flight_option(obj):
         return obj.dict()
     return str(obj)
 
+# One client per process: it is thread-safe and keeps its connection pool warm
+_client = None
+_client_lock = threading.Lock()
+
 def connect_to_mongodb():
     """
     Connect to MongoDB Atlas cloud database
     """
+    global _client
+    # Offline runs use the stand-in loaded from recorded documents
+    if replay.MODE == 'replay':
+        return replay.stand_in_collection()
+
     try:
         # MongoDB Atlas connection
         mongodb_uri = os.getenv('MONGODB_ATLAS_URI')
@@ -23,14 +34,34 @@ def connect_to_mongodb():
             print("Error: MongoDB Atlas URI not found in environment variables")
             return None
         
-        client = MongoClient(mongodb_uri)
-        db = client['trip-cloud']
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(mongodb_uri)
+        db = _client['trip-cloud']
+        ensure_plan_indexes(db['customer_entries'])
+        if replay.MODE == 'record':
+            return replay.RecordingCollection(db['customer_entries'], replay.mongo_path())
         return db['customer_entries']
             
     except Exception as e:
         print(f"Error: Failed to connect to cloud database: {str(e)}")
         return None
 
+_indexes_ensured = False
+
+def ensure_plan_indexes(collection):
+    """Create the indexes plan lookups use, once per process"""
+    global _indexes_ensured
+    if _indexes_ensured:
+        return
+    try:
+        collection.create_index("search_id")
+        # Structured itineraries can be queried by day
+        collection.create_index("itinerary.days.date")
+        _indexes_ensured = True
+    except Exception as e:
+        print(f"Warning: Failed to create database indexes: {str(e)}")
+
 def store_customer_data(customer_data, collection):
     """Store customer data in MongoDB Atlas"""
     if collection is None:
@@ -68,8 +99,8 @@ def store_customer_data(customer_data, collection):
         
     return False
 
-def update_results(timestamp, final_result, collection, search_id):
-    """Update results in MongoDB Atlas"""
+def update_results(timestamp, final_result, collection, search_id, itinerary=None, metrics=None):
+    """Update results in MongoDB Atlas, with the structured itinerary and crew metrics if there are any"""
     if collection is None:
         print("Error: No valid database connection")
         return
@@ -81,6 +112,10 @@ def update_results(timestamp, final_result, collection, search_id):
                 "last_updated": datetime.now()
             }
         }
+        if itinerary is not None:
+            update_data["$set"]["itinerary"] = itinerary
+        if metrics is not None:
+            update_data["$set"]["crew_metrics"] = metrics
         
         result = collection.update_one(
             {"search_id": search_id},
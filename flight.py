@@ -1,128 +1,300 @@
 import os
+import time
+import asyncio
+import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
-from amadeus import Client, ResponseError
+from amadeus import Client, ResponseError, ClientError, NetworkError, ServerError
+from cache import TTLCache
+from resilience import ResilientCaller, TransientError, CircuitOpenError
+from http_pool import PooledHTTP
+from token_generator import SharedAccessToken, TokenError, token_url
+from flight_offers import FlightOffer, normalize_offers, parse_iso_duration
+from flight_ranking import OBJECTIVE_LABELS, OfferSelection
 
 load_dotenv()
 
+# Shared across clients so any session can reuse a recent identical search
+flight_cache = TTLCache(
+    maxsize=int(os.getenv('FLIGHT_CACHE_SIZE', '256')),
+    ttl=float(os.getenv('FLIGHT_CACHE_TTL', '900')),
+    stale_ttl=float(os.getenv('FLIGHT_CACHE_STALE_TTL', '1800')),
+    name="flight search cache"
+)
+
+class RateLimiter:
+    """Token bucket shared by every thread and event loop that calls Amadeus.
+
+    Amadeus allows roughly 10 requests per second with no more than one
+    per 100ms, so concurrent searches queue here instead of getting 429s.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how many seconds to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            # A negative balance is the queue of callers ahead of us
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait on the event loop until a request may be sent"""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+amadeus_rate_limiter = RateLimiter(
+    rate=float(os.getenv('AMADEUS_RATE_LIMIT', '10')),
+    burst=int(os.getenv('AMADEUS_RATE_BURST', '1'))
+)
+
+# Deadline, retries, hedging and circuit breaker for flight searches, sync and async
+amadeus_resilience = ResilientCaller('amadeus', rate_limiter=amadeus_rate_limiter)
+
+def flight_search_metrics():
+    """Cache and upstream counters for the flight search path"""
+    return {
+        'cache': flight_cache.stats(),
+        'amadeus': amadeus_resilience.stats(),
+    }
+
+# Flexible-date search limits: worker threads and date combinations per search
+FLEX_MAX_WORKERS = int(os.getenv('FLEX_MAX_WORKERS', '6'))
+FLEX_MAX_COMBINATIONS = int(os.getenv('FLEX_MAX_COMBINATIONS', '49'))
+
+# How many offers sort_flights keeps per objective
+CHEAPEST_OPTIONS = int(os.getenv('CHEAPEST_OPTIONS', '2'))
+FASTEST_OPTIONS = int(os.getenv('FASTEST_OPTIONS', '2'))
+
+def flight_search_key(flight_routes, adults, children, infants, travel_class, currency, max_results, non_stop):
+    """Normalize a flight search into a hashable cache key.
+
+    Only the fields sent to Amadeus count, so route display details or
+    unrelated trip changes (email, hotel area) still hit the cache.
+    """
+    routes = tuple(
+        (route["origin"].upper(), route["destination"].upper(), route["departure_date"])
+        for route in flight_routes
+    )
+    return (routes, adults, children, infants, travel_class.upper(), currency.upper(), max_results, bool(non_stop))
+
 class AmadeusAPI:
     def __init__(self):
-        # Initialize Amadeus client using credentials from .env
+        # Initialize Amadeus client using credentials from .env, sending
+        # requests over the shared keep-alive connection pool
         self.amadeus = Client(
             client_id=os.getenv('AMADEUS_API_KEY'),
-            client_secret=os.getenv('AMADEUS_API_SECRET')
+            client_secret=os.getenv('AMADEUS_API_SECRET'),
+            http=PooledHTTP()
         )
+        # Reuse the process-wide OAuth token for this client's host (test or production)
+        self.amadeus.access_token = SharedAccessToken(
+            token_url(self.amadeus.host, self.amadeus.ssl, self.amadeus.port))
         self.travel_class = None
         
     def search_flights(self, flight_routes, adults=1, children=0, infants=0, 
-                      travel_class='ECONOMY', currency='EUR', max_results=20, non_stop=False):
+                      travel_class='ECONOMY', currency='EUR', max_results=20, non_stop=False, use_cache=True):
+        """Search for flight offers, reusing a cached response for identical searches."""
+        def load():
+            return self._search_flights(flight_routes, adults, children, infants,
+                                        travel_class, currency, max_results, non_stop)
+
+        self.travel_class = travel_class
+        if not use_cache:
+            return load()
+
+        key = flight_search_key(flight_routes, adults, children, infants, travel_class, currency, max_results, non_stop)
+        response = flight_cache.get_or_load(key, load)
+        if response is None:
+            # Upstream failed or its breaker is open: serve whatever is still cached
+            response = flight_cache.peek(key)
+        if response is None:
+            return None
+        # Copy the list so callers can't modify the cached entry
+        return {'data': list(response['data'])}
+
+    def _search_flights(self, flight_routes, adults=1, children=0, infants=0,
+                        travel_class='ECONOMY', currency='EUR', max_results=20, non_stop=False):
         """Search for flight offers using the Amadeus SDK."""
         try:
-            # Construct originDestinations list
-            origin_destinations = []
-            for i, route in enumerate(flight_routes):
-                origin_destinations.append({
-                    "id": str(i + 1),
-                    "originLocationCode": route["origin"],
-                    "destinationLocationCode": route["destination"],
-                    "departureDateTimeRange": {
-                        "date": route["departure_date"]
-                    }
-                })
-
-            # Construct travelers list
-            travelers = []
-            # Add adults
-            for i in range(adults):
-                travelers.append({"id": str(i+1), "travelerType": "ADULT"})
-            # Add children
-            for i in range(children):
-                travelers.append({"id": str(i+adults+1), "travelerType": "CHILD"})
-            # Add infants
-            for i in range(infants):
-                travelers.append({"id": str(i+adults+children+1), "travelerType": "HELD_INFANT"})
-
-            # Prepare search criteria with non-stop filter if requested
-            search_criteria = {
-                "maxFlightOffers": max_results,
-                "flightFilters": {
-                    "cabinRestrictions": [{
-                        "cabin": travel_class,
-                        "coverage": "ALL_SEGMENTS",
-                        "originDestinationIds": [str(i+1) for i in range(len(flight_routes))]
-                    }]
-                }
-            }
+            body = self._search_body(flight_routes, adults, children, infants,
+                                     travel_class, currency, max_results, non_stop)
 
-            # Add non-stop filter if requested
-            if non_stop:
-                search_criteria["flightFilters"]["connectionRestriction"] = {
-                    "maxNumberOfConnections": 0
-                }
+            # Retried, hedged and bounded by a deadline; see resilience.py
+            response = amadeus_resilience.call(lambda: self._post_search(body))
 
-            # Search flights using SDK
-            response = self.amadeus.shopping.flight_offers_search.post(
-                body={
-                    "currencyCode": currency,
-                    "originDestinations": origin_destinations,
-                    "travelers": travelers,
-                    "sources": ["GDS"],
-                    "searchCriteria": search_criteria
-                }
-            )
-
-            # Convert response to dictionary format
+            # Normalize each offer once, then keep only the selected ones
             if response and hasattr(response, 'data'):
                 self.travel_class = travel_class
                 return {
-                    'data': self.sort_flights(response.data, travel_class)
+                    'data': self.sort_flights(normalize_offers(response.data), travel_class)
                 }
             else:
                 return None
 
-        except ResponseError as error:
+        except CircuitOpenError as error:
+            print(f"Flight search unavailable: {error}")
+            return None
+        except TokenError as error:
+            print(f"Flight search unavailable, could not authenticate with Amadeus: {error}")
+            return None
+        except (ResponseError, TransientError) as error:
             print(f"Error during flight search: {error}")
             return None
         except Exception as e:
             print(f"Error searching flights: {str(e)}")
             return None
 
-    # Keep existing helper methods unchanged
+    def _post_search(self, body):
+        """One flight-offers request through the SDK"""
+        try:
+            return self.amadeus.shopping.flight_offers_search.post(body=body)
+        except (NetworkError, ServerError) as error:
+            raise TransientError(f"Amadeus {error.code}: {error}")
+        except ClientError as error:
+            if error.response.status_code == 429:
+                raise TransientError("Amadeus rate limit exceeded")
+            raise
+
+    @staticmethod
+    def _search_body(flight_routes, adults, children, infants, travel_class, currency, max_results, non_stop):
+        """Build the flight-offers search request body"""
+        # Construct originDestinations list
+        origin_destinations = []
+        for i, route in enumerate(flight_routes):
+            origin_destinations.append({
+                "id": str(i + 1),
+                "originLocationCode": route["origin"],
+                "destinationLocationCode": route["destination"],
+                "departureDateTimeRange": {
+                    "date": route["departure_date"]
+                }
+            })
+
+        # Construct travelers list
+        travelers = []
+        # Add adults
+        for i in range(adults):
+            travelers.append({"id": str(i+1), "travelerType": "ADULT"})
+        # Add children
+        for i in range(children):
+            travelers.append({"id": str(i+adults+1), "travelerType": "CHILD"})
+        # Add infants
+        for i in range(infants):
+            travelers.append({"id": str(i+adults+children+1), "travelerType": "HELD_INFANT"})
+
+        # Prepare search criteria with non-stop filter if requested
+        search_criteria = {
+            "maxFlightOffers": max_results,
+            "flightFilters": {
+                "cabinRestrictions": [{
+                    "cabin": travel_class,
+                    "coverage": "ALL_SEGMENTS",
+                    "originDestinationIds": [str(i+1) for i in range(len(flight_routes))]
+                }]
+            }
+        }
+
+        # Add non-stop filter if requested
+        if non_stop:
+            search_criteria["flightFilters"]["connectionRestriction"] = {
+                "maxNumberOfConnections": 0
+            }
+
+        return {
+            "currencyCode": currency,
+            "originDestinations": origin_destinations,
+            "travelers": travelers,
+            "sources": ["GDS"],
+            "searchCriteria": search_criteria
+        }
+
+    def search_flexible_dates(self, flight_routes, window_days=3, adults=1, children=0, infants=0,
+                              travel_class='ECONOMY', currency='EUR', max_results=20, non_stop=False,
+                              max_workers=FLEX_MAX_WORKERS, max_combinations=FLEX_MAX_COMBINATIONS):
+        """Search every departure date within window_days of each route's date.
+
+        Date combinations run concurrently on a bounded thread pool (paced by
+        the shared rate limiter and deduplicated by the flight cache).
+        Returns {'calendar': [...], 'data': [...]} where each calendar entry
+        holds the dates, cheapest price and shortest duration of one
+        combination, and data is the best overall options as sort_flights
+        picks them.
+        """
+        combinations = self._date_combinations(flight_routes, window_days, max_combinations)
+
+        def search(dates):
+            routes = [dict(route, departure_date=date) for route, date in zip(flight_routes, dates)]
+            return dates, self.search_flights(routes, adults, children, infants,
+                                              travel_class, currency, max_results, non_stop)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return self._flexible_results(executor.map(search, combinations), travel_class)
+
+    def _flexible_results(self, results, travel_class):
+        """Build the calendar and overall best options from (dates, response) pairs"""
+        calendar = []
+        all_offers = []
+        for dates, response in results:
+            offers = response['data'] if response else []
+            calendar.append({
+                'dates': list(dates),
+                'cheapest_price': min((offer.price for offer in offers), default=None),
+                'shortest_duration': min((offer.duration for offer in offers), default=None),
+                'offers': len(offers)
+            })
+            all_offers.extend(offers)
+
+        calendar.sort(key=lambda entry: entry['dates'])
+        return {
+            'calendar': calendar,
+            'data': self.sort_flights(all_offers, travel_class) if all_offers else []
+        }
+
+    @staticmethod
+    def _date_combinations(flight_routes, window_days, max_combinations):
+        """Shifted departure dates per route, closest to the requested dates first"""
+        today = datetime.now().date()
+        base_dates = [datetime.strptime(route["departure_date"], "%Y-%m-%d").date() for route in flight_routes]
+        offsets = range(-window_days, window_days + 1)
+
+        combinations = []
+        for shift in itertools.product(offsets, repeat=len(base_dates)):
+            dates = [base + timedelta(days=offset) for base, offset in zip(base_dates, shift)]
+            # Skip dates in the past and legs that would leave before the previous one
+            if dates[0] < today or any(later < earlier for earlier, later in zip(dates, dates[1:])):
+                continue
+            combinations.append((sum(abs(offset) for offset in shift), tuple(d.isoformat() for d in dates)))
+
+        combinations.sort()
+        return [dates for _, dates in combinations[:max_combinations]]
+
     def parse_duration(self, duration_str):
         """Parse PT duration format to minutes"""
-        duration = duration_str[2:]  
-        hours = 0
-        minutes = 0
-        
-        if 'H' in duration:
-            h_index = duration.index('H')
-            hours = int(duration[:h_index])
-            duration = duration[h_index + 1:]
-        
-        if 'M' in duration:
-            m_index = duration.index('M')
-            minutes = int(duration[:m_index])
-        
-        return hours * 60 + minutes
+        return parse_iso_duration(duration_str)
 
     def get_total_duration(self, flight):
         """Calculate total duration including all segments and connections"""
-        total_minutes = 0
-        
-        # Process all itineraries (outbound and return)
-        for itinerary in flight['itineraries']:
-            # Add segment durations
-            for segment in itinerary['segments']:
-                total_minutes += self.parse_duration(segment['duration'])
-            
-            # Add connection times
-            for i in range(len(itinerary['segments']) - 1):
-                arrival = datetime.fromisoformat(itinerary['segments'][i]['arrival']['at'].replace('Z', '+00:00'))
-                departure = datetime.fromisoformat(itinerary['segments'][i + 1]['departure']['at'].replace('Z', '+00:00'))
-                connection_time = int((departure - arrival).total_seconds() / 60)
-                total_minutes += connection_time
-        
-        return total_minutes
+        if not isinstance(flight, FlightOffer):
+            flight = FlightOffer.from_amadeus(flight)
+        return flight.duration
 
     def format_duration(self, minutes):
         """Convert minutes to hours and minutes format"""
@@ -130,43 +302,43 @@ class AmadeusAPI:
         remaining_minutes = minutes % 60
         return f"{hours}h {remaining_minutes}m"
 
-    def sort_flights(self, flights, travel_class='ECONOMY'):
-            """Sort flights by price and total duration"""
-            # Store the travel class for filtering
-            self.travel_class = travel_class
-            
-            # Filter flights by requested travel class
-            filtered_flights = [f for f in flights if f['travelerPricings'][0]['fareDetailsBySegment'][0]['cabin'] == travel_class]
-            if not filtered_flights:
-                print(f"No flights found in {travel_class} class, showing all options")
-                filtered_flights = flights
-            
-            # Sort by price
-            price_sorted = sorted(filtered_flights, key=lambda x: float(x['price']['total']))
-            
-            # Sort by total duration
-            duration_sorted = sorted(filtered_flights, key=lambda x: self.get_total_duration(x))
-            
-            # Get 2 cheapest options
-            cheapest = price_sorted[:2]
-            
-            # Get 2 fastest options (allow overlap with cheapest)
-            fastest = duration_sorted[:2]
-            
-            # Combine results, ensuring no duplicates
-            sorted_flights = cheapest
-            for flight in fastest:
-                if flight not in sorted_flights:  # Avoid duplicates
-                    sorted_flights.append(flight)
-            
-            return sorted_flights
+    def sort_flights(self, flights, travel_class='ECONOMY', cheapest=CHEAPEST_OPTIONS, fastest=FASTEST_OPTIONS,
+                     pareto=False):
+        """Pick the cheapest then the fastest offers, or the Pareto front if pareto=True.
+
+        Returns labelled FlightOffer records; raw Amadeus offers are
+        normalized first.
+        """
+        selection = self.offer_selection(travel_class, cheapest, fastest, pareto)
+        for offer in normalize_offers(flights):
+            selection.add(offer)
+        return self.selected_offers(selection)
+
+    def offer_selection(self, travel_class='ECONOMY', cheapest=CHEAPEST_OPTIONS, fastest=FASTEST_OPTIONS,
+                        pareto=False):
+        """Running selection that offers can be added to as they are parsed"""
+        # Store the travel class for filtering
+        self.travel_class = travel_class
+        return OfferSelection([('price', cheapest), ('duration', fastest)], cabin=travel_class, pareto=pareto)
+
+    def selected_offers(self, selection):
+        """Labelled copies of the offers a selection picked"""
+        if selection.fell_back:
+            print(f"No flights found in {selection.cabin} class, showing all options")
+        return [offer.with_label(OBJECTIVE_LABELS.get(objective, objective))
+                for objective, offer in selection.results()]
+
+_client = None
+_client_lock = threading.Lock()
 
 def get_amadeus_client():
-    """Create and return an authenticated Amadeus API client"""
-    try:
-        api = AmadeusAPI()
-        return api
-    except Exception as e:
-        print(f"Error initializing Amadeus client: {str(e)}")
-        return None 
-    
\ No newline at end of file
+    """Return the process-wide authenticated Amadeus API client"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            try:
+                _client = AmadeusAPI()
+            except Exception as e:
+                print(f"Error initializing Amadeus client: {str(e)}")
+                return None
+    return _client
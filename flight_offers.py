@@ -0,0 +1,290 @@
+import codecs
+from json import JSONDecoder, JSONDecodeError
+from functools import lru_cache
+from datetime import datetime
+
+# Offers in one response share most of their segments, so the same duration
+# and timestamp strings come up again and again
+@lru_cache(maxsize=4096)
+def parse_iso_duration(duration_str):
+    """Parse an Amadeus PT duration (e.g. 'PT2H35M') to minutes"""
+    duration = duration_str[2:]
+    hours = 0
+    minutes = 0
+
+    if 'H' in duration:
+        h_index = duration.index('H')
+        hours = int(duration[:h_index])
+        duration = duration[h_index + 1:]
+
+    if 'M' in duration:
+        m_index = duration.index('M')
+        minutes = int(duration[:m_index])
+
+    return hours * 60 + minutes
+
+@lru_cache(maxsize=4096)
+def parse_timestamp(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+class Segment:
+    """One flight segment of an offer, read from the Amadeus JSON"""
+    __slots__ = ('origin', 'destination', 'departure_time', 'arrival_time', 'duration', 'minutes', 'carrier',
+                 'flight_number')
+
+    def __init__(self, segment):
+        self.origin = segment['departure']['iataCode']
+        self.destination = segment['arrival']['iataCode']
+        self.departure_time = segment['departure']['at']
+        self.arrival_time = segment['arrival']['at']
+        self.duration = segment['duration']
+        self.minutes = parse_iso_duration(self.duration)
+        self.carrier = segment['carrierCode']
+        self.flight_number = f"{segment['carrierCode']}{segment['number']}"
+
+    def to_dict(self):
+        """The segment dict stored in FlightOption.segments"""
+        return {
+            'origin': self.origin,
+            'destination': self.destination,
+            'departure_time': self.departure_time,
+            'arrival_time': self.arrival_time,
+            'duration': self.duration,
+            'carrier': self.carrier,
+            'flight_number': self.flight_number
+        }
+
+class FlightOffer:
+    """A flight offer's ranking keys, with its segments read on demand.
+
+    from_amadeus() computes only what ranking needs (price, cabin,
+    duration, layover, stops). Most offers in a response are never
+    selected, so Segment objects are built from the raw offer only when an
+    offer's segments are used. `label` says why an offer was selected
+    ('cheapest' or 'fastest').
+    """
+    __slots__ = ('price', 'cabin', 'duration', 'layover', 'stops', 'label', '_offer', '_itineraries',
+                 '_segment_dicts')
+
+    def __init__(self, price, cabin, duration, layover, stops, offer, label=None):
+        self.price = price
+        self.cabin = cabin
+        self.duration = duration
+        self.layover = layover
+        self.stops = stops
+        self.label = label
+        # The raw Amadeus offer the segments are read from
+        self._offer = offer
+        self._itineraries = None
+        self._segment_dicts = None
+
+    @classmethod
+    def from_amadeus(cls, offer):
+        """Ranking keys of one raw Amadeus flight offer"""
+        flying = 0
+        layover = 0
+        stops = 0
+        for itinerary in offer['itineraries']:
+            segments = itinerary['segments']
+            stops += len(segments) - 1
+            for segment in segments:
+                flying += parse_iso_duration(segment['duration'])
+            # Connection time between consecutive segments
+            for arriving, departing in zip(segments, segments[1:]):
+                connection = parse_timestamp(departing['departure']['at']) - parse_timestamp(arriving['arrival']['at'])
+                layover += int(connection.total_seconds() / 60)
+
+        return cls(
+            price=float(offer['price']['total']),
+            cabin=offer['travelerPricings'][0]['fareDetailsBySegment'][0]['cabin'],
+            duration=flying + layover,
+            layover=layover,
+            stops=stops,
+            offer=offer
+        )
+
+    def __repr__(self):
+        return f"FlightOffer(price={self.price}, duration={self.duration}, stops={self.stops}, label={self.label!r})"
+
+    @property
+    def itineraries(self):
+        """Tuple of per-itinerary tuples of Segment (outbound, return, ...), built on first use"""
+        if self._itineraries is None:
+            self._itineraries = tuple(
+                tuple(Segment(segment) for segment in itinerary['segments'])
+                for itinerary in self._offer['itineraries']
+            )
+        return self._itineraries
+
+    @property
+    def segments(self):
+        """All segments from all itineraries, in order"""
+        return [segment for segments in self.itineraries for segment in segments]
+
+    def segment_dicts(self):
+        """Segment dicts for FlightOption, built on first use"""
+        if self._segment_dicts is None:
+            self._segment_dicts = [segment.to_dict() for segment in self.segments]
+        return self._segment_dicts
+
+    def option_fields(self, travel_class):
+        """Field values for a FlightOption, as stored with a plan"""
+        return {
+            'type': self.label,
+            'price': self.price,
+            'travel_class': travel_class,
+            'segments': self.segment_dicts(),
+            'total_duration': self.duration
+        }
+
+    def with_label(self, label):
+        """Copy of this offer labelled for one selection.
+
+        Offers are shared through the flight cache, so selections label a
+        copy rather than the cached record.
+        """
+        offer = object.__new__(FlightOffer)
+        for name in FlightOffer.__slots__:
+            setattr(offer, name, getattr(self, name))
+        offer.label = label
+        return offer
+
+def format_flight_options(flight_options):
+    """Format flight options (FlightOption models or their stored dicts) as text, grouped by why each was selected"""
+    flight_options = [option if isinstance(option, dict) else option.dict() for option in flight_options]
+    sections = [("CHEAPEST OPTIONS", "Cheapest", "cheapest"), ("FASTEST OPTIONS", "Fastest", "fastest")]
+    text = []
+    for heading, label, option_type in sections:
+        text.append(f"\n{heading}:\n")
+        options = [option for option in flight_options if option['type'] == option_type]
+        for i, option in enumerate(options, 1):
+            text.append(f"\nOption {i} - {label}:\n")
+            text.append(f"Total Price: €{option['price']}\n")
+            text.append(f"Travel Class: {option['travel_class']}\n")
+            hours = option['total_duration'] // 60
+            minutes = option['total_duration'] % 60
+            text.append(f"Total Duration: {hours}h {minutes}m\n\n")
+
+            for j, segment in enumerate(option['segments'], 1):
+                text.append(f"Flight Segment {j}:\n")
+                text.append(f"- From: {segment['origin']}\n")
+                text.append(f"- To: {segment['destination']}\n")
+                text.append(f"- Departure: {segment['departure_time']}\n")
+                text.append(f"- Arrival: {segment['arrival_time']}\n")
+                text.append(f"- Duration: {segment['duration']}\n")
+                text.append(f"- Carrier: {segment['carrier']}\n")
+                text.append(f"- Flight Number: {segment['flight_number']}\n\n")
+    return "".join(text)
+
+def normalize_offers(offers):
+    """Normalize raw offers, passing through ones that already are FlightOffer"""
+    return [offer if isinstance(offer, FlightOffer) else FlightOffer.from_amadeus(offer) for offer in offers]
+
+_WHITESPACE = ' \t\r\n'
+_INCOMPLETE = object()
+
+class OfferStreamParser:
+    """Incremental parser for an Amadeus flight-offers response body.
+
+    feed() takes raw bytes as they arrive and returns the offers from the
+    top-level "data" array that are now complete, one decoded dict each.
+    Other top-level members are decoded and dropped, and anything after
+    the array is ignored, so at most one offer and one chunk are held at a
+    time however large the response is.
+    """
+
+    _decoder = JSONDecoder()
+
+    def __init__(self, key='data'):
+        self.key = key
+        self.done = False
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._state = 'object'
+        self._member = None
+
+    def feed(self, chunk):
+        if self.done:
+            return []
+        self._buffer = self._buffer[self._pos:] + self._utf8.decode(chunk)
+        self._pos = 0
+        offers = []
+        while not self.done and self._step(offers):
+            pass
+        return offers
+
+    def close(self):
+        """Check the response was complete"""
+        if not self.done:
+            raise ValueError("Flight offers response ended before its data array was complete")
+
+    def _skip_whitespace(self):
+        """Move past whitespace; False if the buffer ran out"""
+        buffer, pos = self._buffer, self._pos
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        self._pos = pos
+        return pos < len(buffer)
+
+    def _decode(self):
+        """Decode the next JSON value, or _INCOMPLETE if it hasn't fully arrived"""
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except JSONDecodeError:
+            # Usually a value cut off by the chunk boundary; close() reports real errors
+            return _INCOMPLETE
+        # A number at the very end of the buffer may still have digits to come
+        if end == len(self._buffer) and not isinstance(value, (dict, list, str)):
+            return _INCOMPLETE
+        self._pos = end
+        return value
+
+    def _expect(self, char):
+        if self._buffer[self._pos] != char:
+            raise ValueError(f"Unexpected {self._buffer[self._pos]!r} in flight offers response, expected {char!r}")
+        self._pos += 1
+
+    def _step(self, offers):
+        """Parse one token or value; False when more input is needed"""
+        if not self._skip_whitespace():
+            return False
+        char = self._buffer[self._pos]
+
+        if self._state == 'object':
+            self._expect('{')
+            self._state = 'member'
+        elif self._state == 'member':
+            if char == '}':
+                self.done = True
+            elif char == ',':
+                self._pos += 1
+            else:
+                key = self._decode()
+                if key is _INCOMPLETE:
+                    return False
+                self._member = key
+                self._state = 'colon'
+        elif self._state == 'colon':
+            self._expect(':')
+            self._state = 'value'
+        elif self._state == 'value':
+            if self._member == self.key:
+                self._expect('[')
+                self._state = 'items'
+            else:
+                if self._decode() is _INCOMPLETE:
+                    return False
+                self._state = 'member'
+        elif self._state == 'items':
+            if char == ']':
+                self._pos += 1
+                self.done = True
+            elif char == ',':
+                self._pos += 1
+            else:
+                offer = self._decode()
+                if offer is _INCOMPLETE:
+                    return False
+                offers.append(offer)
+        return True
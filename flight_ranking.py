@@ -0,0 +1,139 @@
+import heapq
+
+# Objectives an offer can be ranked on; lower is better for all of them.
+# They are attributes of flight_offers.FlightOffer, computed once per offer.
+OBJECTIVES = ('price', 'duration', 'stops', 'layover')
+
+# Label given to offers picked for each objective
+OBJECTIVE_LABELS = {
+    'price': 'cheapest',
+    'duration': 'fastest',
+    'stops': 'fewest stops',
+    'layover': 'shortest layovers',
+}
+
+def objective_key(offer, objectives):
+    return tuple(getattr(offer, objective) for objective in objectives)
+
+def top_k(offers, objective, k):
+    """The k best offers for one objective, ties kept in input order"""
+    return heapq.nsmallest(k, offers, key=lambda offer: getattr(offer, objective))
+
+def dominates(a, b, objectives=OBJECTIVES):
+    """True if a is no worse than b on every objective and better on one"""
+    better = False
+    for objective in objectives:
+        a_value, b_value = getattr(a, objective), getattr(b, objective)
+        if a_value > b_value:
+            return False
+        if a_value < b_value:
+            better = True
+    return better
+
+def pareto_front(offers, objectives=OBJECTIVES):
+    """Offers no other offer beats on all objectives, ordered by the objectives.
+
+    Candidates are visited in lexicographic order, so an offer can only be
+    dominated by one already on the front and each check is against the
+    (usually small) front rather than every offer.
+    """
+    front = []
+    seen = set()
+    for candidate in sorted(offers, key=lambda offer: objective_key(offer, objectives)):
+        key = objective_key(candidate, objectives)
+        # Identical keys add nothing new to the trade-off
+        if key in seen:
+            continue
+        if not any(dominates(kept, candidate, objectives) for kept in front):
+            front.append(candidate)
+            seen.add(key)
+    return front
+
+def select_offers(offers, per_objective):
+    """Pick the best offers for each objective in turn, without duplicates.
+
+    per_objective is an ordered list of (objective, count) pairs such as
+    [('price', 2), ('duration', 2)]. Offers already chosen for an earlier
+    objective are not repeated, so the result may be shorter than the sum
+    of counts. Returns (objective, offer) pairs.
+    """
+    selected = []
+    chosen = set()
+    for objective, count in per_objective:
+        for candidate in top_k(offers, objective, count):
+            # Identity, not dict equality: offers are distinct response entries
+            if id(candidate) not in chosen:
+                chosen.add(id(candidate))
+                selected.append((objective, candidate))
+    return selected
+
+class OfferSelection:
+    """Running select_offers / pareto_front for offers that arrive one at a time.
+
+    Only offers that could still be selected are kept: the best `count` per
+    objective, or the current Pareto front. Offers outside `cabin` are only
+    kept until one in the cabin arrives, as a fallback when none do. The
+    results match select_offers / pareto_front over all the offers added.
+    """
+
+    def __init__(self, per_objective, cabin=None, pareto=False):
+        self.per_objective = [(objective, count) for objective, count in per_objective if count > 0]
+        self.cabin = cabin
+        self.pareto = pareto
+        self.count = 0
+        self.matched = 0
+        self._in_cabin = self._new_pool()
+        self._any_cabin = self._new_pool()
+
+    def _new_pool(self):
+        if self.pareto:
+            return []
+        return {objective: [] for objective, _ in self.per_objective}
+
+    def add(self, offer):
+        seq = self.count
+        self.count += 1
+        if self.cabin is None or offer.cabin == self.cabin:
+            self.matched += 1
+            self._keep(self._in_cabin, seq, offer)
+            # The fallback pool is no longer needed
+            self._any_cabin = None
+        elif self._any_cabin is not None:
+            self._keep(self._any_cabin, seq, offer)
+
+    def _keep(self, pool, seq, offer):
+        if self.pareto:
+            key = objective_key(offer, OBJECTIVES)
+            for _, kept in pool:
+                if dominates(kept, offer) or objective_key(kept, OBJECTIVES) == key:
+                    return
+            pool[:] = [(kept_seq, kept) for kept_seq, kept in pool if not dominates(offer, kept)]
+            pool.append((seq, offer))
+            return
+
+        for objective, count in self.per_objective:
+            heap = pool[objective]
+            # Max-heap on (value, arrival) via negation: the root is the worst kept offer
+            entry = (-getattr(offer, objective), -seq, offer)
+            if len(heap) < count:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+    @property
+    def fell_back(self):
+        """True if no offer was in the requested cabin, so all cabins are used"""
+        return self.cabin is not None and self.count > 0 and not self.matched
+
+    def results(self):
+        """(objective, offer) pairs as select_offers returns them, or ('pareto', offer) for the front"""
+        pool = self._any_cabin if self.fell_back else self._in_cabin
+        if self.pareto:
+            kept = {seq: offer for seq, offer in pool}
+        else:
+            kept = {-neg_seq: offer for heap in pool.values() for _, neg_seq, offer in heap}
+        # Arrival order, so ties break the same way as over the full list
+        offers = [kept[seq] for seq in sorted(kept)]
+        if self.pareto:
+            return [('pareto', offer) for offer in pareto_front(offers)]
+        return select_offers(offers, self.per_objective)
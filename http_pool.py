@@ -0,0 +1,67 @@
+import os
+import threading
+from urllib.error import URLError
+import requests
+from requests.adapters import HTTPAdapter
+
+# Connections kept open per host; roughly the number of concurrent searches
+POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))
+REQUEST_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '30'))
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Return the process-wide keep-alive requests session"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+    return _session
+
+class PooledResponse:
+    """Just enough of http.client.HTTPResponse for the Amadeus SDK parser"""
+
+    def __init__(self, response):
+        self._response = response
+        self.status = response.status_code
+        self.code = response.status_code
+
+    def getcode(self):
+        return self.status
+
+    def info(self):
+        # Case-insensitive, so 'Content-Type' lookups work however the server spells it
+        return self._response.headers
+
+    def read(self):
+        return self._response.content
+
+class PooledHTTP:
+    """urlopen-compatible callable that sends requests over the shared session.
+
+    The Amadeus SDK accepts a custom `http` handler; plain urlopen opens a
+    new TLS connection for every call, this reuses pooled connections.
+    """
+
+    def __init__(self, session=None, timeout=REQUEST_TIMEOUT):
+        self.session = session or get_session()
+        self.timeout = timeout
+
+    def __call__(self, http_request):
+        try:
+            response = self.session.request(
+                http_request.get_method(),
+                http_request.full_url,
+                headers=dict(http_request.header_items()),
+                data=http_request.data,
+                timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            # The SDK turns URLError into a NetworkError response
+            raise URLError(e)
+        return PooledResponse(response)
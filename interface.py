@@ -6,9 +6,9 @@ from utils import (
     show_progress,
     get_single_key
 )
-from retrieve_plan import get_plan_by_search_id, display_plan
-from database import connect_to_mongodb
-from main import run_crew
+# The planner, database and crewai modules are imported where they are first
+# used, and warmed in the background, so the menu appears straight away
+import prewarm
 
 def display_logo():
     """Display the Cocolancer logo and welcome menu"""
@@ -87,6 +87,7 @@ def display_logo():
     print_centered(welcome_text)
 
 def main():
+    prewarm.start()
     while True:
         display_logo()
         choice = get_single_key().lower()
@@ -102,6 +103,7 @@ def main():
             clear_screen()
             print_centered("Starting Your Travel Planning Journey...")
             time.sleep(1)
+            from main import run_crew
             run_crew()
             input("\nPress Enter to return to the main menu...")
             
@@ -110,6 +112,8 @@ def main():
             print_centered("Retrieve Your Travel Plan")
             print_centered("-----------------------")
             
+            from database import connect_to_mongodb
+            from retrieve_plan import get_plan_by_search_id, display_plan
             collection = connect_to_mongodb()
             if collection is None:
                 print_centered("Error: Could not connect to the database")
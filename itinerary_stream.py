@@ -0,0 +1,207 @@
+import os
+import sys
+import time
+import threading
+from datetime import datetime
+import litellm
+from dotenv import load_dotenv
+from crewai import LLM
+from flight_offers import OfferStreamParser
+from retrieve_plan import format_day
+
+load_dotenv()
+
+# Print the itinerary as the compiler writes it, instead of after it finishes
+STREAM_ITINERARY = os.getenv('STREAM_ITINERARY', 'false').lower() == 'true'
+# Seconds between partial itinerary writes to the plan document
+STREAM_DB_INTERVAL = float(os.getenv('STREAM_DB_INTERVAL', '2'))
+
+# Agents reason before answering; only what follows this marker is the itinerary
+FINAL_ANSWER = "Final Answer:"
+
+class ItineraryStream:
+    """Tee for the itinerary as it is generated.
+
+    Text after the agent's "Final Answer:" marker is written to the
+    terminal straight away, kept for the email, and saved to the plan
+    document as partial_itinerary every STREAM_DB_INTERVAL seconds.
+
+    A structured (JSON) answer is not shown as JSON: each day is rendered
+    as text, as retrieve_plan does, once it has arrived in full.
+    """
+
+    def __init__(self, collection=None, search_id=None, out=None, on_first_text=None,
+                 db_interval=STREAM_DB_INTERVAL):
+        self.collection = collection
+        self.search_id = search_id
+        self.out = out or sys.stdout
+        self.on_first_text = on_first_text
+        self.db_interval = db_interval
+        self._parts = []
+        self._pending = ""
+        self._answering = False
+        # How the final answer is shown: None until known, then 'text', 'json' or 'hidden'
+        self._mode = None
+        self._head = ""
+        self._days = None
+        self._day_count = 0
+        self._saved_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def text(self):
+        """The itinerary streamed so far"""
+        return "".join(self._parts).strip()
+
+    def begin(self):
+        """Start of an LLM call; its text is shown once it reaches the final answer"""
+        with self._lock:
+            self._pending = ""
+            self._answering = False
+            self._mode = None
+            self._head = ""
+            self._days = None
+            self._day_count = 0
+
+    def write(self, token):
+        with self._lock:
+            if not self._answering:
+                self._pending += token
+                marker = self._pending.find(FINAL_ANSWER)
+                if marker < 0:
+                    return
+                self._answering = True
+                token = self._pending[marker + len(FINAL_ANSWER):].lstrip()
+                self._pending = ""
+
+            token = self._render(token)
+            if not token:
+                return
+            first = not self._parts
+            self._parts.append(token)
+
+        if first and self.on_first_text:
+            self.on_first_text()
+        self.out.write(token)
+        self.out.flush()
+        if time.monotonic() - self._saved_at >= self.db_interval:
+            self._save()
+
+    def _render(self, token):
+        """What to show for token: itself, or the days of a JSON answer it completes"""
+        if self._mode is None:
+            # Wait for the answer's first character to tell text from JSON
+            self._head += token
+            start = self._head.lstrip()
+            if start.startswith('`'):
+                # A ```json fence; the answer starts on the next line
+                if '\n' not in start:
+                    return ""
+                start = start.split('\n', 1)[1].lstrip()
+            if not start:
+                return ""
+            self._head = ""
+            if not start.startswith('{'):
+                self._mode = 'text'
+                return start
+            self._mode = 'json'
+            self._days = OfferStreamParser(key='days')
+            token = start
+        if self._mode == 'text':
+            return token
+        if self._mode == 'hidden':
+            return ""
+
+        try:
+            days = self._days.feed(token.encode('utf-8'))
+        except ValueError:
+            # Not the expected shape: the final itinerary is shown when it is done
+            self._mode = 'hidden'
+            return ""
+        rendered = []
+        for day in days:
+            self._day_count += 1
+            rendered.append(format_day(day, self._day_count) + "\n\n")
+        return "".join(rendered)
+
+    def _save(self):
+        self._saved_at = time.monotonic()
+        if self.collection is None:
+            return
+        try:
+            self.collection.update_one(
+                {"search_id": self.search_id},
+                {"$set": {"partial_itinerary": self.text, "last_updated": datetime.now()}}
+            )
+        except Exception as e:
+            print(f"\nError: Failed to save partial itinerary: {str(e)}")
+
+    def close(self):
+        """Drop the partial copy once the final itinerary has been stored"""
+        if self._parts:
+            self.out.write("\n")
+            self.out.flush()
+        if self.collection is None:
+            return
+        try:
+            self.collection.update_one({"search_id": self.search_id}, {"$unset": {"partial_itinerary": ""}})
+        except Exception as e:
+            print(f"Error: Failed to clear partial itinerary: {str(e)}")
+
+class StreamingLLM(LLM):
+    """LLM that requests a streamed completion and feeds each token to stream_sink"""
+
+    stream_sink = None
+
+    def call(self, messages, callbacks=[]):
+        if self.stream_sink is None:
+            return super().call(messages, callbacks)
+        if callbacks:
+            self.set_callbacks(callbacks)
+
+        params = {
+            "model": self.model,
+            "messages": messages,
+            "timeout": self.timeout,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "n": self.n,
+            "stop": self.stop,
+            "max_tokens": self.max_tokens or self.max_completion_tokens,
+            "presence_penalty": self.presence_penalty,
+            "frequency_penalty": self.frequency_penalty,
+            "logit_bias": self.logit_bias,
+            "response_format": self.response_format,
+            "seed": self.seed,
+            "api_base": self.base_url,
+            "api_version": self.api_version,
+            "api_key": self.api_key,
+            **self.kwargs,
+            "stream": True,
+            # So token usage is still reported to the callbacks
+            "stream_options": {"include_usage": True},
+        }
+        params = {k: v for k, v in params.items() if v is not None}
+
+        self.stream_sink.begin()
+        parts = []
+        for chunk in litellm.completion(**params):
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                parts.append(token)
+                self.stream_sink.write(token)
+        return "".join(parts)
+
+def streaming_llm(llm, sink):
+    """A copy of llm that streams into sink, keeping llm's own behaviour (such as caching)"""
+    llm_class = type(llm)
+    if not issubclass(llm_class, StreamingLLM):
+        # Subclass first, so a cached answer is still served before any request
+        llm_class = StreamingLLM if llm_class is LLM else type(
+            f"Streaming{llm_class.__name__}", (llm_class, StreamingLLM), {})
+    streaming = llm_class.__new__(llm_class)
+    streaming.__dict__.update(llm.__dict__)
+    streaming.stream_sink = sink
+    return streaming
@@ -0,0 +1,89 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+from crewai import LLM
+from tool_cache import ToolCache, cache_key
+
+load_dotenv()
+
+# Tasks whose completions are cached, comma-separated, or 'all'; off by default
+LLM_CACHE_TASKS = {name.strip() for name in os.getenv('LLM_CACHE_TASKS', '').split(',') if name.strip()}
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', str(7 * 24 * 3600)))
+
+# Request settings that change the completion, besides the messages
+KEY_PARAMS = ('model', 'temperature', 'top_p', 'n', 'stop', 'max_tokens', 'max_completion_tokens',
+              'presence_penalty', 'frequency_penalty', 'logit_bias', 'response_format', 'seed', 'base_url')
+
+# Completions share the tool cache's stores, under their own name
+completion_cache = ToolCache('llm', LLM_CACHE_TTL)
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+def llm_cache_enabled(task_name):
+    return 'all' in LLM_CACHE_TASKS or task_name in LLM_CACHE_TASKS
+
+def _count(task_name, hit, seconds):
+    with _stats_lock:
+        stats = _stats.setdefault(task_name, {'hits': 0, 'misses': 0, 'saved_seconds': 0.0})
+        if hit:
+            stats['hits'] += 1
+            stats['saved_seconds'] += seconds
+        else:
+            stats['misses'] += 1
+
+def completion_key(llm, task_name, messages):
+    """Hash of the model settings and the full conversation.
+
+    The messages carry the system prompt, the task description with its
+    inputs rendered in, and every tool call and observation so far, so a
+    prompt only matches when all of them are identical.
+    """
+    params = [getattr(llm, name, None) for name in KEY_PARAMS]
+    return cache_key('llm', task_name, params, sorted(llm.kwargs.items()), messages)
+
+class CachedLLM(LLM):
+    """LLM that answers repeated prompts from the completion cache"""
+
+    task_name = None
+
+    @classmethod
+    def from_llm(cls, llm, task_name):
+        """A caching copy of llm, counted under task_name"""
+        cached = cls.__new__(cls)
+        cached.__dict__.update(llm.__dict__)
+        cached.task_name = task_name
+        return cached
+
+    def call(self, messages, callbacks=[]):
+        key = completion_key(self, self.task_name, messages)
+        entry = completion_cache.get(key)
+        if entry is not None:
+            _count(self.task_name, True, entry['seconds'])
+            return entry['content']
+
+        started = time.monotonic()
+        content = super().call(messages, callbacks)
+        elapsed = time.monotonic() - started
+        _count(self.task_name, False, 0)
+        # Empty answers are retried by the agent, so they aren't kept
+        if content:
+            completion_cache.set(key, {'content': content, 'seconds': round(elapsed, 3)})
+        return content
+
+def cache_completions(agent, task_name):
+    """Give agent a caching LLM if LLM_CACHE_TASKS enables task_name"""
+    if llm_cache_enabled(task_name) and isinstance(agent.llm, LLM) and not isinstance(agent.llm, CachedLLM):
+        agent.llm = CachedLLM.from_llm(agent.llm, task_name)
+    return agent
+
+def llm_cache_stats():
+    """Per-task completion cache hits, misses, hit rate and LLM seconds saved"""
+    with _stats_lock:
+        stats = {task_name: dict(counts) for task_name, counts in _stats.items()}
+    for counts in stats.values():
+        lookups = counts['hits'] + counts['misses']
+        counts['hit_rate'] = round(counts['hits'] / lookups, 3) if lookups else 0.0
+        counts['saved_seconds'] = round(counts['saved_seconds'], 1)
+    return stats
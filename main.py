@@ -1,6 +1,9 @@
 import warnings
 warnings.filterwarnings('ignore', category=UserWarning, module='pydantic._internal._config')
-from my_crew import SurpriseTravelCrew
+import replay
+# Record or replay external services when REPLAY_MODE is set, before any client is created
+replay.install()
+import prewarm
 import json
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
@@ -8,8 +11,11 @@ from send_email import send_email
 import ast
 import random
 from database import connect_to_mongodb, store_customer_data, update_results
+import crew_metrics
+from retrieve_plan import format_itinerary
 from flight import get_amadeus_client
-from airport_lookup import AirportLookup
+from airport_lookup import get_airport_lookup
+from flight_offers import format_flight_options
 from utils import (
     show_progress, 
     clear_screen, 
@@ -79,7 +85,7 @@ def get_non_empty_input(prompt, error_message="This field cannot be empty. Pleas
 
 def get_airport_code(prompt):
     """Get airport code using the lookup system"""
-    airport_lookup = AirportLookup()
+    airport_lookup = get_airport_lookup()
     return airport_lookup.get_airport_selection(prompt)
 
 def get_traveler_counts():
@@ -194,7 +200,7 @@ def calculate_stay_duration(departure_date, return_date):
 
 def get_flight_route_info(trip_type):
     """Get flight route information based on trip type"""
-    airport_lookup = AirportLookup()
+    airport_lookup = get_airport_lookup()
     departure_info = []
     flight_routes = []
     stay_durations = []
@@ -736,7 +742,10 @@ def run_crew():
             # Start the actual planning process
             progress = show_progress("Searching for flights")
             try:
-                crew = SurpriseTravelCrew()
+                # Built in the background while the trip details were being entered
+                crew = prewarm.take_crew()
+                # Loads crewai, which the crew above has already done
+                from itinerary_stream import STREAM_ITINERARY, ItineraryStream
                 flight_options = crew.get_flight_options(crew_inputs)
             finally:
                 progress.set()
@@ -748,68 +757,13 @@ def run_crew():
                 return
 
             # Format flight options text
-            flight_options_text = ""
-            flight_options_text += "\nCHEAPEST OPTIONS:\n"
-            for i, option in enumerate(flight_options[:2], 1):
-                flight_options_text += f"\nOption {i} - Cheapest:\n"
-                flight_options_text += f"Total Price: €{option.price}\n"
-                flight_options_text += f"Travel Class: {option.travel_class}\n"
-                hours = option.total_duration // 60
-                minutes = option.total_duration % 60
-                flight_options_text += f"Total Duration: {hours}h {minutes}m\n\n"
-                
-                for j, segment in enumerate(option.segments, 1):
-                    flight_options_text += f"Flight Segment {j}:\n"
-                    flight_options_text += f"- From: {segment['origin']}\n"
-                    flight_options_text += f"- To: {segment['destination']}\n"
-                    flight_options_text += f"- Departure: {segment['departure_time']}\n"
-                    flight_options_text += f"- Arrival: {segment['arrival_time']}\n"
-                    flight_options_text += f"- Duration: {segment['duration']}\n"
-                    flight_options_text += f"- Carrier: {segment['carrier']}\n"
-                    flight_options_text += f"- Flight Number: {segment['flight_number']}\n\n"
-
-            # Add fastest options
-            flight_options_text += "\nFASTEST OPTIONS:\n"
-            for i, option in enumerate(flight_options[2:4], 1):
-                flight_options_text += f"\nOption {i} - Fastest:\n"
-                flight_options_text += f"Total Price: €{option.price}\n"
-                flight_options_text += f"Travel Class: {option.travel_class}\n"
-                hours = option.total_duration // 60
-                minutes = option.total_duration % 60
-                flight_options_text += f"Total Duration: {hours}h {minutes}m\n\n"
-                
-                for j, segment in enumerate(option.segments, 1):
-                    flight_options_text += f"Flight Segment {j}:\n"
-                    flight_options_text += f"- From: {segment['origin']}\n"
-                    flight_options_text += f"- To: {segment['destination']}\n"
-                    flight_options_text += f"- Departure: {segment['departure_time']}\n"
-                    flight_options_text += f"- Arrival: {segment['arrival_time']}\n"
-                    flight_options_text += f"- Duration: {segment['duration']}\n"
-                    flight_options_text += f"- Carrier: {segment['carrier']}\n"
-                    flight_options_text += f"- Flight Number: {segment['flight_number']}\n\n"
-
-            # Update crew inputs with flight options
-            crew_inputs['flight_options_text'] = flight_options_text
+            flight_options_text = format_flight_options(flight_options)
 
-            # Show itinerary planning progress
-            progress = show_progress("Creating your perfect itinerary")
-            try:
-                results = crew.crew().kickoff(inputs=crew_inputs)
-            finally:
-                progress.set()
-                print("\n")
-
-            # Extract final result
-            if hasattr(results, 'raw_output'):
-                final_result = results.raw_output
-            elif hasattr(results, 'output'):
-                final_result = results.output
-            elif hasattr(results, 'result'):
-                final_result = results.result
-            else:
-                final_result = str(results)
+            # Update crew inputs with flight options; each task gets its own compact view
+            # of them (prompt_encoding.py), the text is kept for storage
+            crew_inputs['flight_options'] = flight_options
+            crew_inputs['flight_options_text'] = flight_options_text
 
-            # Store in database
             customer_data = {
                 "search_id": search_id,
                 "timestamp": datetime.now(),
@@ -826,22 +780,68 @@ def run_crew():
                     "trip_type": trip_info['trip_type'],
                     "flight_routes": trip_info['flight_routes'],
                     "travel_class": travel_class,
+                    "non_stop": non_stop,
                     "hotel_locations": hotel_locations
                 },
                 "flight_options": [flight.dict() for flight in flight_options],
                 "flight_options_text": flight_options_text,
-                "final_itinerary": final_result
+                "final_itinerary": None
             }
 
-            if collection is not None:
-                if not store_customer_data(customer_data, collection):
+            # Show itinerary planning progress
+            progress = show_progress("Creating your perfect itinerary")
+            stream = None
+            if STREAM_ITINERARY:
+                # Store the plan first, so partial output has a document to go into
+                if collection is not None and not store_customer_data(customer_data, collection):
                     print("Warning: Failed to store initial data in database")
-                update_results(datetime.now(), final_result, collection, search_id)
+                # The spinner stops as soon as the itinerary starts arriving
+                def stop_spinner():
+                    progress.set()
+                    progress.worker.join()
+                stream = ItineraryStream(collection, search_id, on_first_text=stop_spinner)
+                crew.stream_itinerary(stream)
+            crew_metrics.start_plan()
+            try:
+                results = crew.plan_trip(crew_inputs)
+            finally:
+                progress.set()
+                print("\n")
+                # Per-task time, tokens, tool calls and cost, stored with the plan
+                customer_data["crew_metrics"] = crew_metrics.finish_plan()
 
-            # Display results
-            clear_screen()
+            # Extract final result
+            if hasattr(results, 'raw_output'):
+                final_result = results.raw_output
+            elif hasattr(results, 'output'):
+                final_result = results.output
+            elif hasattr(results, 'result'):
+                final_result = results.result
+            else:
+                final_result = str(results)
+
+            # The compiler returns a validated Itinerary: store it as fields, show it as text
+            itinerary = getattr(results, 'pydantic', None)
+            if itinerary is not None:
+                customer_data["itinerary"] = itinerary.model_dump()
+                final_result = format_itinerary(customer_data["itinerary"])
 
-            print(final_result)
+            # Store in database
+            customer_data["final_itinerary"] = final_result
+            if collection is not None:
+                if stream is None and not store_customer_data(customer_data, collection):
+                    print("Warning: Failed to store initial data in database")
+                update_results(datetime.now(), final_result, collection, search_id,
+                               customer_data.get("itinerary"), customer_data["crew_metrics"])
+            if stream is not None:
+                stream.close()
+
+            # Display results, unless they were already streamed as text
+            if not (stream and stream.text) or itinerary is not None:
+                clear_screen()
+                print(final_result)
+            if crew_metrics.CREW_METRICS_REPORT:
+                crew_metrics.print_plan_report(customer_data["crew_metrics"])
             print(f"\nYour search ID: {search_id}")
 
             # Ask about email notification
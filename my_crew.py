@@ -1,23 +1,48 @@
 from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task
-from crewai_tools import SerperDevTool, ScrapeWebsiteTool
+from tool_cache import CachedSerperDevTool, CachedScrapeWebsiteTool
+from llm_cache import cache_completions
+from itinerary_stream import streaming_llm
+from crew_metrics import task_scope
+from prompt_encoding import TASK_VIEWS, task_inputs, trip_stays, count_tokens
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 import json
 import os
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import load_dotenv
 from flight import get_amadeus_client
+from async_flight import get_async_amadeus_client, run_on_search_loop, on_search_loop
 from datetime import datetime
 from utils import show_progress
 
 # Load environment variables
 load_dotenv()
 
+# Activity planning and restaurant scouting don't depend on each other, so
+# they run concurrently and the itinerary compiler waits for both
+PARALLEL_TASKS = os.getenv('PARALLEL_TASKS', 'true').lower() == 'true'
+
+# Multi-city trips research each stop separately, in this many workers at once
+CITY_FANOUT = os.getenv('CITY_FANOUT', 'true').lower() == 'true'
+CITY_RESEARCH_WORKERS = int(os.getenv('CITY_RESEARCH_WORKERS', '6'))
+
+# Print the prompt tokens each task's inputs add, compact against verbose
+PROMPT_TOKEN_REPORT = os.getenv('PROMPT_TOKEN_REPORT', 'false').lower() == 'true'
+
+# Per-city research tasks and the agents that run them
+CITY_RESEARCH_TASKS = [
+    ('personalized_activity_planning_task', 'personalized_activity_planner'),
+    ('restaurant_scouting_task', 'restaurant_scout'),
+]
+
 class FlightOption(BaseModel):
     type: str = Field(..., description="The type of flight option (fastest or cheapest)")
     price: float = Field(..., description="The total price of all flights")
     travel_class: str = Field(..., description="The travel class (economy, business, first)")
-    segments: List[Dict] = Field(..., description="List of all flight segments")
+    segments: List[Dict[str, Any]] = Field(..., description="List of all flight segments")
     total_duration: int = Field(..., description="Total duration in minutes including connections")
 
     class Config:
@@ -53,6 +78,32 @@ class Itinerary(BaseModel):
     hotel: str = Field(..., description="The hotel of the itinerary")
     flight_options: List[FlightOption] = Field(..., description="All flight options (2 cheapest and 2 fastest)")
 
+class ViewTask(Task):
+    """Task that receives the flight and trip inputs rendered for its own needs.
+
+    prompt_view names the entry of prompt_encoding.TASK_VIEWS to use.
+    """
+    prompt_view: Optional[str] = None
+
+    def interpolate_inputs(self, inputs):
+        super().interpolate_inputs(task_inputs(inputs, self.prompt_view) if inputs else inputs)
+
+    def execute_async(self, agent=None, context=None, tools=None):
+        """As Task.execute_async, but the thread runs in a copy of the caller's context,
+        so its LLM and tool calls are counted for the caller's plan (crew_metrics)"""
+        future = Future()
+        threading.Thread(
+            daemon=True,
+            target=contextvars.copy_context().run,
+            args=(self._execute_task_async, agent, context, tools, future),
+        ).start()
+        return future
+
+    def _execute_core(self, agent, context, tools):
+        # Runs on the thread doing the work, for sync and async tasks alike
+        with task_scope(self.prompt_view, (agent or self.agent).role):
+            return super()._execute_core(agent, context, tools)
+
 @CrewBase
 class SurpriseTravelCrew():
     """Surprise Travel Crew"""
@@ -73,7 +124,7 @@ class SurpriseTravelCrew():
     def personalized_activity_planner(self) -> Agent:
         return Agent(
             config=self.agents_config['personalized_activity_planner'],
-            tools=[SerperDevTool(), ScrapeWebsiteTool()],
+            tools=[CachedSerperDevTool(), CachedScrapeWebsiteTool()],
             verbose=False,
             allow_delegation=False,
         )
@@ -82,7 +133,7 @@ class SurpriseTravelCrew():
     def restaurant_scout(self) -> Agent:
         return Agent(
             config=self.agents_config['restaurant_scout'],
-            tools=[SerperDevTool(), ScrapeWebsiteTool()],
+            tools=[CachedSerperDevTool(), CachedScrapeWebsiteTool()],
             verbose=False,
             allow_delegation=False,
         )
@@ -98,9 +149,10 @@ class SurpriseTravelCrew():
         
     @task
     def flight_search_task(self) -> Task:
-        return Task(
+        return ViewTask(
             config=self.tasks_config['flight_search_task'],
-            agent=self.flight_search_agent(),
+            prompt_view='flight_search_task',
+            agent=cache_completions(self.flight_search_agent(), 'flight_search_task'),
         )
 
     @task
@@ -109,16 +161,22 @@ class SurpriseTravelCrew():
         Plan activities considering the stay duration at each destination.
         For multi-city trips, activities should be planned according to the time spent at each stop.
         """
-        return Task(
+        return ViewTask(
             config=self.tasks_config['personalized_activity_planning_task'],
-            agent=self.personalized_activity_planner(),
+            prompt_view='personalized_activity_planning_task',
+            agent=cache_completions(self.personalized_activity_planner(), 'personalized_activity_planning_task'),
+            async_execution=PARALLEL_TASKS,
+            context=[self.flight_search_task()],
         )
     
     @task
     def restaurant_scouting_task(self) -> Task:
-        return Task(
+        return ViewTask(
             config=self.tasks_config['restaurant_scouting_task'],
-            agent=self.restaurant_scout(),
+            prompt_view='restaurant_scouting_task',
+            agent=cache_completions(self.restaurant_scout(), 'restaurant_scouting_task'),
+            async_execution=PARALLEL_TASKS,
+            context=[self.flight_search_task()],
         )
    
     @task
@@ -126,9 +184,14 @@ class SurpriseTravelCrew():
         """
         Compile the itinerary ensuring activities fit within the specified stay duration.
         """
-        return Task(
+        return ViewTask(
             config=self.tasks_config['itinerary_compilation_task'],
-            agent=self.itinerary_compiler(),
+            prompt_view='itinerary_compilation_task',
+            agent=cache_completions(self.itinerary_compiler(), 'itinerary_compilation_task'),
+            # Validated into an Itinerary, so the plan can be stored as fields
+            output_pydantic=Itinerary,
+            # Waits for both planning tasks and sees both of their outputs
+            context=[self.personalized_activity_planning_task(), self.restaurant_scouting_task()],
         )
         
     @crew 
@@ -150,7 +213,8 @@ class SurpriseTravelCrew():
                 adults=inputs['adults'],
                 children=inputs['children'],
                 infants=inputs['infants'],
-                non_stop=inputs.get('non_stop', False)
+                non_stop=inputs.get('non_stop', False),
+                flexible_days=inputs.get('flexible_days', 0)
             )
         else:
             # Handle legacy format where origin/destination are provided directly
@@ -173,48 +237,130 @@ class SurpriseTravelCrew():
                 adults=inputs['adults'],
                 children=inputs['children'],
                 infants=inputs['infants'],
-                non_stop=inputs.get('non_stop', False)
+                non_stop=inputs.get('non_stop', False),
+                flexible_days=inputs.get('flexible_days', 0)
             )
             
         return flight_options
 
-    def kickoff(self, inputs):
-        """Execute the crew with progress indicators"""
-        # Flight Search Progress
-        progress = show_progress("Searching for flights")
-        try:
-            flight_results = self.flight_search_task().execute(inputs)
-        finally:
-            progress.set()
-            print("Flight search successful.")
+    def plan_trip(self, inputs):
+        """Run the crew, researching each stop of a multi-city trip in parallel"""
+        if PROMPT_TOKEN_REPORT:
+            print_prompt_report(self.prompt_report(inputs))
+        stays = city_stays(inputs)
+        if not CITY_FANOUT or len(stays) < 2:
+            return self.crew().kickoff(inputs=inputs)
+        return self.plan_by_city(inputs, stays)
 
-        # Activity Planning Progress
-        progress = show_progress("Planning activities")
-        try:
-            activity_results = self.personalized_activity_planning_task().execute(inputs)
-        finally:
-            progress.set()
-            print("\n🎯  Activities planned!")
+    def plan_by_city(self, inputs, stays):
+        """Search flights once, research every stop in a worker pool, then compile.
 
-        # Restaurant Scouting Progress
-        progress = show_progress("Finding restaurants")
-        try:
-            restaurant_results = self.restaurant_scouting_task().execute(inputs)
-        finally:
-            progress.set()
-            print("\n🍽️  Restaurant recommendations ready!")
+        Each stop gets its own activity and restaurant task with only that
+        stop's dates and hotel in its inputs, so the prompts stay small and
+        the research takes as long as the slowest city rather than the sum
+        of all of them. The compiler sees every stop's results as context.
+        """
+        flight_task = self.flight_search_task()
+        Crew(agents=[flight_task.agent], tasks=[flight_task], process=Process.sequential,
+             verbose=False).kickoff(inputs=inputs)
+
+        jobs = []
+        for stay in stays:
+            for task_name, agent_name in CITY_RESEARCH_TASKS:
+                # Agents keep per-run executor state, so each job gets its own copy
+                agent = cache_completions(getattr(self, agent_name)().copy(), task_name)
+                task = ViewTask(config=self.tasks_config[task_name], prompt_view=task_name,
+                                agent=agent, context=[flight_task])
+                jobs.append((task, city_inputs(inputs, stay)))
 
-        # Itinerary Compilation Progress
-        progress = show_progress("Creating your perfect itinerary")
+        def research(job):
+            task, job_inputs = job
+            Crew(agents=[task.agent], tasks=[task], process=Process.sequential,
+                 verbose=False).kickoff(inputs=job_inputs)
+
+        with ThreadPoolExecutor(max_workers=CITY_RESEARCH_WORKERS) as executor:
+            # Each job runs in its own copy of this context, so it counts towards this plan
+            futures = [executor.submit(contextvars.copy_context().run, research, job) for job in jobs]
+            # Re-raises the first failed job here
+            for future in futures:
+                future.result()
+
+        compile_task = ViewTask(
+            config=self.tasks_config['itinerary_compilation_task'],
+            prompt_view='itinerary_compilation_task',
+            agent=cache_completions(self.itinerary_compiler(), 'itinerary_compilation_task'),
+            # Validated into an Itinerary, so the plan can be stored as fields
+            output_pydantic=Itinerary,
+            # Stop by stop, activities before restaurants
+            context=[task for task, _ in jobs],
+        )
+        return Crew(agents=[compile_task.agent], tasks=[compile_task], process=Process.sequential,
+                    verbose=False).kickoff(inputs=inputs)
+
+    def stream_itinerary(self, sink):
+        """Send the itinerary compiler's output to sink (an ItineraryStream) as it is generated"""
+        # Build the task first, so the completion cache wraps the LLM before streaming does
+        self.itinerary_compilation_task()
+        compiler = self.itinerary_compiler()
+        compiler.llm = streaming_llm(compiler.llm, sink)
+
+    def prompt_report(self, inputs):
+        """Tokens in each task's rendered description: {task: (verbose, compact)}.
+
+        Verbose renders the flight_options_text and trip_details_text given
+        in inputs; compact renders the task's own view of them.
+        """
+        report = {}
+        for task_name in TASK_VIEWS:
+            config = self.tasks_config[task_name]
+            template = f"{config['description']}\n{config['expected_output']}"
+            report[task_name] = (count_tokens(template.format(**inputs)),
+                                 count_tokens(template.format(**task_inputs(inputs, task_name))))
+        return report
+
+    def kickoff(self, inputs):
+        """Execute the crew with a progress indicator"""
+        progress = show_progress("Planning your trip")
         try:
-            final_results = self.itinerary_compilation_task().execute(inputs)
+            results = self.plan_trip(inputs)
         finally:
             progress.set()
-            print("\n🌴  Your travel plan is ready!\n")
+        print("\n🌴  Your travel plan is ready!\n")
+        return results
+
+def print_prompt_report(report):
+    print(f"{'task':40} {'verbose':>8} {'compact':>8}")
+    for task_name, (verbose, compact) in report.items():
+        print(f"{task_name:40} {verbose:>8} {compact:>8}")
+    print(f"{'total':40} {sum(v for v, _ in report.values()):>8} {sum(c for _, c in report.values()):>8}")
 
-        return final_results
+def city_stays(inputs):
+    """One entry per stop of a multi-city trip: the arriving route, the next one (if any) and the hotel"""
+    if inputs.get('trip_type') != 'multi-city':
+        return []
+    return [{
+        'city': arrival['destination_details']['city'],
+        'arrival': arrival,
+        'departure': departure,
+        'hotel': hotel,
+        'stay_duration': arrival.get('stay_duration', 0)
+    } for arrival, departure, hotel in trip_stays(inputs)]
+
+def city_inputs(inputs, stay):
+    """Crew inputs narrowed to one stop, for that stop's research tasks"""
+    routes = [stay['arrival']]
+    if stay['departure']:
+        # Only gives the date the stop ends: without its stay it isn't rendered as a stop itself
+        routes.append({k: v for k, v in stay['departure'].items() if k != 'stay_duration'})
+    # Each task's trip_details_text is rendered from these by task_inputs
+    return dict(
+        inputs,
+        flight_routes=routes,
+        hotel_locations=[stay['hotel']] if stay['hotel'] else [],
+        stay_duration=stay['stay_duration']
+    )
 
-def search_flights(flight_routes, travel_class='economy', adults=1, children=0, infants=0, non_stop=False):
+def search_flights(flight_routes, travel_class='economy', adults=1, children=0, infants=0, non_stop=False, flexible_days=0):
     """
     Search flights using Amadeus API
     Args:
@@ -224,9 +370,14 @@ def search_flights(flight_routes, travel_class='economy', adults=1, children=0,
         children (int): Number of child travelers (2-11 years)
         infants (int): Number of infant travelers (0-2 years)
         non_stop (bool): If True, only search for non-stop flights
+        flexible_days (int): If set, also search departures up to this many days either side of each date
     """
-    amadeus = get_amadeus_client()
-    if not amadeus:
+    return run_on_search_loop(search_flights_async(flight_routes, travel_class, adults, children, infants,
+                                                   non_stop, flexible_days))
+
+async def search_flights_async(flight_routes, travel_class='economy', adults=1, children=0, infants=0, non_stop=False, flexible_days=0):
+    """Awaitable search_flights, so several searches can share one event loop"""
+    if not get_amadeus_client():
         return []
 
     try:
@@ -237,46 +388,33 @@ def search_flights(flight_routes, travel_class='economy', adults=1, children=0,
             'first': 'FIRST'
         }
         
-        # Search flights using the API client
-        response = amadeus.search_flights(
-            flight_routes=flight_routes,
-            travel_class=class_mapping.get(travel_class.lower(), 'ECONOMY'),
-            adults=adults,
-            children=children,
-            infants=infants,
-            non_stop=non_stop
-        )
+        search_args = {
+            'flight_routes': flight_routes,
+            'travel_class': class_mapping.get(travel_class.lower(), 'ECONOMY'),
+            'adults': adults,
+            'children': children,
+            'infants': infants,
+            'non_stop': non_stop
+        }
+
+        # Search flights over non-blocking HTTP, paced by the shared rate limiter, on the
+        # long-lived client so connections and the token are reused across searches
+        amadeus = get_async_amadeus_client()
+        if amadeus is None:
+            return []
+        if flexible_days:
+            search = amadeus.search_flexible_dates_async(window_days=flexible_days, **search_args)
+        else:
+            search = amadeus.search_flights_async(**search_args)
+        response = await on_search_loop(search)
         
         if not response or 'data' not in response:
             return []
             
+        # Offers arrive normalized and labelled, so no JSON is re-parsed here
         flight_options = []
         for offer in response['data']:
-            segments = []
-            total_duration = 0
-            
-            # Process all segments from all itineraries
-            for itinerary in offer['itineraries']:
-                for segment in itinerary['segments']:
-                    segments.append({
-                        'origin': segment['departure']['iataCode'],
-                        'destination': segment['arrival']['iataCode'],
-                        'departure_time': segment['departure']['at'],
-                        'arrival_time': segment['arrival']['at'],
-                        'duration': segment['duration'],
-                        'carrier': segment['carrierCode'],
-                        'flight_number': f"{segment['carrierCode']}{segment['number']}"
-                    })
-                    
-            flight_option = FlightOption(
-                type="cheapest" if offer in response['data'][:2] else "fastest",
-                price=float(offer['price']['total']),
-                travel_class=travel_class,
-                segments=segments,
-                total_duration=amadeus.get_total_duration(offer)
-            )
-            
-            flight_options.append(flight_option)
+            flight_options.append(FlightOption(**offer.option_fields(travel_class)))
             
         return flight_options
 
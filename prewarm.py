@@ -0,0 +1,84 @@
+import os
+import warnings
+import threading
+
+# Longest a plan waits for the crew being built before building its own
+PREWARM_WAIT_SECONDS = float(os.getenv('PREWARM_WAIT_SECONDS', '20'))
+
+_lock = threading.Lock()
+_thread = None
+_crew = None
+
+def _warm():
+    """Import the planner and build a crew for the next plan, opening its clients alongside"""
+    global _crew
+    # As main does, so nothing prints over the menu
+    warnings.filterwarnings('ignore', category=UserWarning, module='pydantic._internal._config')
+    # Failures are left for the real call to report; this only saves time
+    try:
+        import replay
+        # Clients must be created after recording or replay is set up, as main does;
+        # main prints the mode line, not this thread
+        replay.install(announce=False)
+        # crewai, crewai_tools and litellm: most of the start-up time
+        from my_crew import SurpriseTravelCrew
+        from database import connect_to_mongodb
+        from flight import get_amadeus_client
+        from airport_lookup import get_airport_lookup
+        # Loaded only so the planner's first use doesn't wait for them
+        import send_email, retrieve_plan
+    except Exception:
+        return
+
+    # Clients are only opened when configured, so nothing prints over the menu
+    warmers = [get_airport_lookup]
+    if os.getenv('MONGODB_ATLAS_URI') or replay.MODE == 'replay':
+        warmers.append(connect_to_mongodb)
+    if os.getenv('AMADEUS_API_KEY') and os.getenv('AMADEUS_API_SECRET'):
+        # The OAuth token the first search would otherwise wait for
+        warmers.append(lambda: get_amadeus_client().amadeus.access_token._bearer_token())
+    # In their own thread: a slow network must not hold up take_crew()
+    threading.Thread(target=_open_clients, args=(warmers,), name='prewarm-clients', daemon=True).start()
+
+    try:
+        crew = SurpriseTravelCrew()
+        # Builds every agent, task and tool instance
+        crew.crew()
+    except Exception:
+        return
+    with _lock:
+        _crew = crew
+
+def _open_clients(warmers):
+    for warm in warmers:
+        try:
+            warm()
+        except Exception:
+            pass
+
+def start():
+    """Start warming in the background, unless it is already running"""
+    global _thread
+    with _lock:
+        if _thread is not None and _thread.is_alive():
+            return
+        _thread = threading.Thread(target=_warm, name='prewarm', daemon=True)
+        _thread.start()
+
+def take_crew():
+    """The pre-built crew, waiting up to PREWARM_WAIT_SECONDS if it is being built, or a new one.
+
+    Each crew plans one trip, so another is warmed for the next plan.
+    """
+    global _crew
+    with _lock:
+        thread = _thread
+    if thread is not None:
+        thread.join(PREWARM_WAIT_SECONDS)
+    with _lock:
+        crew, _crew = _crew, None
+    if crew is None:
+        from my_crew import SurpriseTravelCrew
+        crew = SurpriseTravelCrew()
+    start()
+    return crew
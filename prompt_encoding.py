@@ -0,0 +1,149 @@
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to an estimate
+    tiktoken = None
+
+# What each task sees of the flights and the trip:
+#   flights - 'full' (prices, flight numbers), 'schedule' (times only) or None
+#   trip    - 'full' (travelers, legs, hotels) or 'stays' (one row per stop)
+VIEWS = {
+    'full': {'flights': 'full', 'trip': 'full'},
+    'schedule': {'flights': 'schedule', 'trip': 'stays'},
+    'stays': {'flights': None, 'trip': 'stays'},
+}
+
+TASK_VIEWS = {
+    'flight_search_task': 'full',
+    # Activities are planned around arrival and departure times
+    'personalized_activity_planning_task': 'schedule',
+    # Restaurants only need where and when, and who is eating
+    'restaurant_scouting_task': 'stays',
+    'itinerary_compilation_task': 'full',
+}
+
+TRAVELER_TYPES = {'ADT': 'A', 'CHD': 'C', 'INF': 'I'}
+
+def short_time(timestamp):
+    """'2026-11-01T08:05:00' -> '2026-11-01 08:05'"""
+    return str(timestamp).replace('T', ' ')[:16]
+
+def short_duration(duration):
+    """'PT2H5M' -> '2h5m'; minutes -> '2h5m'"""
+    if isinstance(duration, int):
+        return f"{duration // 60}h{duration % 60}m"
+    return str(duration).replace('PT', '').lower()
+
+def flight_code(segment):
+    number = str(segment['flight_number'])
+    return number if number.startswith(segment['carrier']) else f"{segment['carrier']}{number}"
+
+def table(header, rows):
+    """Pipe-separated rows under a header line"""
+    return "\n".join(["|".join(header)] + ["|".join(str(value) for value in row) for row in rows])
+
+def encode_flight_options(flight_options, view='full'):
+    """Flight options as a segment table plus one row per option.
+
+    Segments shared by several options (the cheapest flight is often also
+    among the fastest) are listed once and referenced by id.
+    """
+    if not flight_options:
+        return ""
+    full = view == 'full'
+    segment_ids = {}
+    segment_rows = []
+    option_rows = []
+    for option in flight_options:
+        ids = []
+        for segment in option.segments:
+            key = tuple(sorted(segment.items()))
+            if key not in segment_ids:
+                segment_ids[key] = f"s{len(segment_ids) + 1}"
+                row = [segment_ids[key], segment['origin'], segment['destination'],
+                       short_time(segment['departure_time']), short_time(segment['arrival_time'])]
+                if full:
+                    row += [short_duration(segment['duration']), flight_code(segment)]
+                segment_rows.append(row)
+            ids.append(segment_ids[key])
+        row = [option.type]
+        if full:
+            row += [f"{option.price:.2f}", option.travel_class, short_duration(option.total_duration)]
+        option_rows.append(row + [",".join(ids)])
+
+    if full:
+        return "\n".join([
+            "FLIGHTS (price EUR total, times local)",
+            table(['seg', 'from', 'to', 'dep', 'arr', 'dur', 'flight'], segment_rows),
+            table(['option', 'price', 'class', 'total', 'segs'], option_rows),
+        ])
+    return "\n".join([
+        "FLIGHT TIMES (local)",
+        table(['seg', 'from', 'to', 'dep', 'arr'], segment_rows),
+        table(['option', 'segs'], option_rows),
+    ])
+
+def place(details):
+    return f"{details['code']} {details['city']}" if details.get('city') else details['code']
+
+def trip_stays(inputs):
+    """(route, next route or None, hotel or None) for each stop of the trip"""
+    routes = inputs.get('flight_routes') or []
+    hotels = inputs.get('hotel_locations') or []
+    stays = list(zip(routes, routes[1:] + [None]))
+    if len(routes) > 1 and not ('stay_duration' in routes[-1] and routes[-1]['destination'] != routes[0]['origin']):
+        # The last flight goes home unless there is a stay planned at its destination
+        stays = stays[:-1]
+    return [(route, following, hotels[i] if i < len(hotels) else None)
+            for i, (route, following) in enumerate(stays)]
+
+def encode_trip_details(inputs, view='full'):
+    """Trip details with short keys: passengers, then legs or stops"""
+    lines = [f"pax: {inputs['adults']}A {inputs['children']}C {inputs['infants']}I (A adult, C child, I infant)"]
+    if view == 'full':
+        travelers = inputs.get('travelers') or []
+        if travelers:
+            lines.append("travelers: " + "; ".join(
+                f"{traveler['name']} ({TRAVELER_TYPES.get(traveler['type'], traveler['type'])})" for traveler in travelers))
+        lines.append(f"trip: {inputs.get('trip_type', '')}")
+        lines.append(table(['leg', 'from', 'to', 'date', 'stay_days'], [
+            [i, place(route['origin_details']), place(route['destination_details']),
+             route['departure_date'], route.get('stay_duration', '')]
+            for i, route in enumerate(inputs.get('flight_routes') or [], 1)
+        ]))
+        hotels = inputs.get('hotel_locations') or []
+        if hotels:
+            lines.append("hotel areas: " + "; ".join(f"{hotel['city']}: {hotel['location']}" for hotel in hotels))
+        return "\n".join(lines)
+
+    lines.append(table(['stop', 'city', 'arrive', 'leave', 'days', 'hotel_area'], [
+        [i, route['destination_details']['city'], route['departure_date'],
+         following['departure_date'] if following else '', route.get('stay_duration', ''),
+         hotel['location'] if hotel else '']
+        for i, (route, following, hotel) in enumerate(trip_stays(inputs), 1)
+    ]))
+    return "\n".join(lines)
+
+def task_inputs(inputs, task_name):
+    """Crew inputs with the flight and trip text rendered for task_name's view.
+
+    Needs the structured 'flight_options' and 'flight_routes' inputs;
+    without them the inputs are returned unchanged.
+    """
+    view = VIEWS.get(TASK_VIEWS.get(task_name))
+    if view is None or 'flight_routes' not in inputs or 'adults' not in inputs:
+        return inputs
+    rendered = dict(inputs, trip_details_text=encode_trip_details(inputs, view['trip']))
+    if 'flight_options' in inputs:
+        rendered['flight_options_text'] = (encode_flight_options(inputs['flight_options'], view['flights'])
+                                           if view['flights'] else "")
+    return rendered
+
+def count_tokens(text, model='gpt-4o-mini'):
+    """Tokens in text for model, or an estimate of 4 characters per token"""
+    if tiktoken is None:
+        return len(text) // 4
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding('cl100k_base')
+    return len(encoding.encode(text))
@@ -0,0 +1,535 @@
+import os
+import copy
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import smtplib
+import threading
+from collections import defaultdict, deque
+from datetime import timedelta
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from dotenv import load_dotenv
+import requests
+from requests.structures import CaseInsensitiveDict
+
+load_dotenv()
+
+# off: talk to the real services. record: talk to them and save every
+# exchange under REPLAY_DIR. replay: serve the saved exchanges offline.
+MODE = os.getenv('REPLAY_MODE', 'off').lower()
+REPLAY_DIR = os.getenv('REPLAY_DIR', 'recordings')
+# Fixed latency for every replayed call; unset replays the recorded timings
+FIXED_LATENCY_MS = os.getenv('REPLAY_LATENCY_MS')
+# Multiplier for recorded timings, e.g. 0 for no delay or 2 for a slow upstream
+LATENCY_SCALE = float(os.getenv('REPLAY_LATENCY_SCALE', '1'))
+DB_LATENCY_MS = float(os.getenv('REPLAY_DB_LATENCY_MS', '0'))
+
+# Left out of request matching, so recordings made with real credentials
+# replay on a machine without them. Request bodies are only stored as a hash.
+SECRET_FIELDS = {'client_id', 'client_secret', 'password', 'api_key', 'apikey', 'key'}
+# Replaced in recorded JSON responses so issued tokens never reach the disk
+RESPONSE_SECRET_FIELDS = {'access_token', 'refresh_token', 'id_token'}
+# Headers that no longer describe the stored (already decoded) body
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'set-cookie'}
+
+class ReplayMissError(LookupError):
+    """No recorded exchange matches a request made in replay mode"""
+
+def latency(recorded_seconds):
+    """Seconds a replayed call should take"""
+    if FIXED_LATENCY_MS is not None:
+        return float(FIXED_LATENCY_MS) / 1000
+    return recorded_seconds * LATENCY_SCALE
+
+def _scrub_body(body, content_type):
+    """Request body with credentials removed, as text"""
+    if body is None:
+        return ''
+    if isinstance(body, bytes):
+        body = body.decode('utf-8', 'replace')
+    if 'json' in content_type:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return body
+        if isinstance(data, dict):
+            data = {k: v for k, v in data.items() if k.lower() not in SECRET_FIELDS}
+        return json.dumps(data, sort_keys=True)
+    if 'x-www-form-urlencoded' in content_type:
+        return urlencode([(k, v) for k, v in parse_qsl(body) if k.lower() not in SECRET_FIELDS])
+    return body
+
+def _scrub_response(content):
+    """Response body with issued tokens replaced"""
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return content
+    if not isinstance(data, dict) or not RESPONSE_SECRET_FIELDS & data.keys():
+        return content
+    for field in RESPONSE_SECRET_FIELDS & data.keys():
+        data[field] = 'replay-token'
+    return json.dumps(data).encode('utf-8')
+
+def _endpoint(method, url):
+    parts = urlsplit(url)
+    return f"{method.upper()} {parts.netloc}{parts.path}"
+
+def _scrub_url(url):
+    parts = urlsplit(url)
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query) if k.lower() not in SECRET_FIELDS])
+    return parts._replace(query=query).geturl()
+
+def _exchange_key(method, url, body, content_type):
+    digest = hashlib.sha1(_scrub_body(body, content_type).encode()).hexdigest()
+    return f"{method.upper()} {_scrub_url(url)} {digest}"
+
+class Cassette:
+    """Recorded HTTP exchanges, stored as JSON lines in REPLAY_DIR/http.jsonl.
+
+    Replay matches a request by method, URL and body first. When prompts or
+    IDs differ from the recording run, it falls back to the next unused
+    exchange for the same endpoint, in recording order.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._by_key = defaultdict(deque)
+        self._by_endpoint = defaultdict(deque)
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    exchange = json.loads(line)
+                    exchange['used'] = False
+                    self._by_key[exchange['key']].append(exchange)
+                    self._by_endpoint[exchange['endpoint']].append(exchange)
+
+    def record(self, method, url, body, content_type, status, reason, headers, content, elapsed):
+        exchange = {
+            'key': _exchange_key(method, url, body, content_type),
+            'endpoint': _endpoint(method, url),
+            'status': status,
+            'reason': reason,
+            'headers': {k: v for k, v in headers.items() if k.lower() not in DROPPED_HEADERS},
+            'elapsed': round(elapsed, 4),
+        }
+        content = _scrub_response(content)
+        try:
+            exchange['body'] = content.decode('utf-8')
+        except UnicodeDecodeError:
+            exchange['body_b64'] = base64.b64encode(content).decode('ascii')
+
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(exchange) + '\n')
+
+    def match(self, method, url, body, content_type):
+        """Take the recorded exchange for a request, or raise ReplayMissError"""
+        key = _exchange_key(method, url, body, content_type)
+        endpoint = _endpoint(method, url)
+        with self._lock:
+            self._load()
+            exchange = self._take(self._by_key[key]) or self._take(self._by_endpoint[endpoint])
+        if exchange is None:
+            raise ReplayMissError(f"No recorded response for {endpoint}")
+        return exchange
+
+    @staticmethod
+    def _take(queue):
+        """Next unused exchange; the last one is reused once all are used"""
+        for exchange in queue:
+            if not exchange['used']:
+                exchange['used'] = True
+                return exchange
+        return queue[-1] if queue else None
+
+def body_bytes(exchange):
+    if 'body_b64' in exchange:
+        return base64.b64decode(exchange['body_b64'])
+    return exchange.get('body', '').encode('utf-8')
+
+cassette = Cassette(os.path.join(REPLAY_DIR, 'http.jsonl'))
+
+# requests: Amadeus SDK (through http_pool), token endpoint, Serper and scrape tools
+
+def _requests_send(original):
+    def send(session, request, **kwargs):
+        content_type = request.headers.get('Content-Type', '')
+        if MODE == 'replay':
+            try:
+                exchange = cassette.match(request.method, request.url, request.body, content_type)
+            except ReplayMissError as e:
+                raise requests.ConnectionError(str(e), request=request)
+            time.sleep(latency(exchange['elapsed']))
+            response = requests.Response()
+            response.status_code = exchange['status']
+            response.reason = exchange['reason']
+            response.headers = CaseInsensitiveDict(exchange['headers'])
+            response._content = body_bytes(exchange)
+            response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+            response.url = request.url
+            response.request = request
+            response.elapsed = timedelta(seconds=exchange['elapsed'])
+            return response
+
+        started = time.monotonic()
+        response = original(session, request, **kwargs)
+        content = response.content
+        cassette.record(request.method, request.url, request.body, content_type, response.status_code,
+                        response.reason, response.headers, content, time.monotonic() - started)
+        return response
+    return send
+
+# httpx: OpenAI/LiteLLM and the async Amadeus client
+
+def _httpx_response(httpx, request, exchange):
+    return httpx.Response(
+        exchange['status'],
+        headers=exchange['headers'],
+        content=body_bytes(exchange),
+        request=request
+    )
+
+def _httpx_send(original, httpx):
+    def handle_request(transport, request):
+        content_type = request.headers.get('Content-Type', '')
+        if MODE == 'replay':
+            try:
+                exchange = cassette.match(request.method, str(request.url), request.read(), content_type)
+            except ReplayMissError as e:
+                raise httpx.ConnectError(str(e), request=request)
+            time.sleep(latency(exchange['elapsed']))
+            return _httpx_response(httpx, request, exchange)
+
+        started = time.monotonic()
+        body = request.read()
+        response = original(transport, request)
+        content = response.read()
+        cassette.record(request.method, str(request.url), body, content_type, response.status_code,
+                        response.reason_phrase, response.headers, content, time.monotonic() - started)
+        return response
+    return handle_request
+
+def _httpx_send_async(original, httpx):
+    async def handle_async_request(transport, request):
+        content_type = request.headers.get('Content-Type', '')
+        if MODE == 'replay':
+            try:
+                exchange = cassette.match(request.method, str(request.url), await request.aread(), content_type)
+            except ReplayMissError as e:
+                raise httpx.ConnectError(str(e), request=request)
+            await asyncio.sleep(latency(exchange['elapsed']))
+            return _httpx_response(httpx, request, exchange)
+
+        started = time.monotonic()
+        body = await request.aread()
+        response = await original(transport, request)
+        content = await response.aread()
+        cassette.record(request.method, str(request.url), body, content_type, response.status_code,
+                        response.reason_phrase, response.headers, content, time.monotonic() - started)
+        return response
+    return handle_async_request
+
+# MongoDB
+
+_OPERATORS = {
+    '$eq': lambda value, arg: value == arg,
+    '$ne': lambda value, arg: value != arg,
+    '$gt': lambda value, arg: value is not None and value > arg,
+    '$gte': lambda value, arg: value is not None and value >= arg,
+    '$lt': lambda value, arg: value is not None and value < arg,
+    '$lte': lambda value, arg: value is not None and value <= arg,
+    '$in': lambda value, arg: value in arg,
+    '$exists': lambda value, arg: (value is not None) == bool(arg),
+}
+
+def _resolve(document, field):
+    """Value at a dotted path, with numeric parts indexing into lists"""
+    value = document
+    for part in field.split('.'):
+        if isinstance(value, dict):
+            value = value.get(part)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return None
+    return value
+
+def _matches(document, query):
+    """Equality and simple comparison operators on dotted paths"""
+    for field, expected in query.items():
+        value = _resolve(document, field)
+        if isinstance(expected, dict) and expected and all(op.startswith('$') for op in expected):
+            if not all(_OPERATORS[op](value, arg) for op, arg in expected.items()):
+                return False
+        elif value != expected:
+            return False
+    return True
+
+def _include(value, paths):
+    """Keep only the given split paths; lists of documents are projected element-wise"""
+    if isinstance(value, list):
+        return [_include(item, paths) for item in value if isinstance(item, dict)]
+    if not isinstance(value, dict):
+        return copy.deepcopy(value)
+    nested = defaultdict(list)
+    for head, *rest in paths:
+        nested[head].append(rest)
+    result = {}
+    for head, rests in nested.items():
+        if head in value:
+            whole = any(not rest for rest in rests)
+            result[head] = copy.deepcopy(value[head]) if whole else _include(value[head], rests)
+    return result
+
+def _slice(values, spec):
+    """Mongo's $slice: n first items, -n last items, or [skip, limit]"""
+    if isinstance(spec, list):
+        skip, limit = spec
+        start = skip if skip >= 0 else max(0, len(values) + skip)
+        return values[start:start + limit]
+    return values[:spec] if spec >= 0 else values[spec:]
+
+def _project(document, projection):
+    """Apply a simple inclusion or exclusion projection, with $slice on arrays"""
+    if not projection:
+        return copy.deepcopy(document)
+    include = [field.split('.') for field, flag in projection.items() if flag and field != '_id']
+    if not include:
+        return {k: copy.deepcopy(v) for k, v in document.items() if projection.get(k, 1) != 0}
+
+    result = _include(document, include)
+    if projection.get('_id', 1) and '_id' in document:
+        result['_id'] = document['_id']
+    for field, flag in projection.items():
+        if isinstance(flag, dict) and '$slice' in flag:
+            *parents, name = field.split('.')
+            target = _resolve(result, '.'.join(parents)) if parents else result
+            if isinstance(target, dict) and isinstance(target.get(name), list):
+                target[name] = _slice(target[name], flag['$slice'])
+    return result
+
+class ReplayCollection:
+    """In-memory stand-in for the customer_entries collection.
+
+    Seeded from the documents saved in record mode. Writes stay in memory
+    so a replayed run never changes the recording.
+    """
+
+    def __init__(self, documents=()):
+        self._documents = [copy.deepcopy(document) for document in documents]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _pause():
+        if DB_LATENCY_MS:
+            time.sleep(DB_LATENCY_MS / 1000)
+
+    def insert_one(self, document):
+        from bson import ObjectId
+        from pymongo.results import InsertOneResult
+        self._pause()
+        document.setdefault('_id', ObjectId())
+        with self._lock:
+            self._documents.append(copy.deepcopy(document))
+        return InsertOneResult(document['_id'], True)
+
+    def find(self, filter=None, projection=None, **kwargs):
+        self._pause()
+        with self._lock:
+            return [_project(d, projection) for d in self._documents if _matches(d, filter or {})]
+
+    def find_one(self, filter=None, projection=None, **kwargs):
+        found = self.find(filter, projection)
+        return found[0] if found else None
+
+    def _update(self, filter, update):
+        """Apply $set and $unset to the first matching document; caller holds the lock"""
+        for document in self._documents:
+            if _matches(document, filter):
+                for field, value in update.get('$set', {}).items():
+                    target = document
+                    parts = field.split('.')
+                    for part in parts[:-1]:
+                        target = target.setdefault(part, {})
+                    target[parts[-1]] = copy.deepcopy(value)
+                for field in update.get('$unset', {}):
+                    target = _resolve(document, field.rpartition('.')[0]) if '.' in field else document
+                    if isinstance(target, dict):
+                        target.pop(field.rpartition('.')[2], None)
+                return True
+        return False
+
+    def update_one(self, filter, update, upsert=False):
+        from pymongo.results import UpdateResult
+        self._pause()
+        with self._lock:
+            modified = int(self._update(filter, update))
+        return UpdateResult({'n': modified, 'nModified': modified}, True)
+
+    def bulk_write(self, requests, ordered=True):
+        """UpdateOne requests only, applied in one call as the real collection does"""
+        from pymongo.results import BulkWriteResult
+        self._pause()
+        with self._lock:
+            modified = sum(self._update(request._filter, request._doc) for request in requests)
+        return BulkWriteResult({'nMatched': modified, 'nModified': modified, 'nUpserted': 0,
+                                'nInserted': 0, 'nRemoved': 0, 'upserted': []}, True)
+
+class RecordingCollection:
+    """Wraps the real collection and saves every document it reads or writes"""
+
+    def __init__(self, collection, path):
+        self._collection = collection
+        self._path = path
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def _save(self, document):
+        from bson import json_util
+        with self._lock:
+            os.makedirs(os.path.dirname(self._path) or '.', exist_ok=True)
+            with open(self._path, 'a', encoding='utf-8') as f:
+                f.write(json_util.dumps(document) + '\n')
+
+    def insert_one(self, document, *args, **kwargs):
+        result = self._collection.insert_one(document, *args, **kwargs)
+        self._save(document)
+        return result
+
+    def find_one(self, *args, **kwargs):
+        document = self._collection.find_one(*args, **kwargs)
+        if document is not None:
+            self._save(document)
+        return document
+
+_collection = None
+_collection_lock = threading.Lock()
+
+def mongo_path():
+    return os.path.join(REPLAY_DIR, 'mongo.jsonl')
+
+def stand_in_collection():
+    """Process-wide replay collection, loaded from the recording"""
+    global _collection
+    with _collection_lock:
+        if _collection is None:
+            from bson import json_util
+            documents = {}
+            if os.path.exists(mongo_path()):
+                with open(mongo_path(), encoding='utf-8') as f:
+                    for line in f:
+                        if line.strip():
+                            document = json_util.loads(line)
+                            # The latest copy of each document wins
+                            documents[str(document.get('_id'))] = document
+            _collection = ReplayCollection(documents.values())
+    return _collection
+
+# SMTP
+
+def smtp_path():
+    return os.path.join(REPLAY_DIR, 'smtp.jsonl')
+
+def _save_message(message, elapsed):
+    os.makedirs(REPLAY_DIR, exist_ok=True)
+    with open(smtp_path(), 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'to': message.get('To'), 'subject': message.get('Subject'),
+                            'elapsed': round(elapsed, 4), 'message': message.as_string()}) + '\n')
+
+def _recorded_smtp_latency():
+    if not os.path.exists(smtp_path()):
+        return 0.0
+    with open(smtp_path(), encoding='utf-8') as f:
+        timings = [json.loads(line)['elapsed'] for line in f if line.strip()]
+    return sum(timings) / len(timings) if timings else 0.0
+
+class RecordingSMTP(smtplib.SMTP):
+    """smtplib.SMTP that keeps a copy and the send time of every message"""
+
+    def send_message(self, msg, *args, **kwargs):
+        started = time.monotonic()
+        result = super().send_message(msg, *args, **kwargs)
+        _save_message(msg, time.monotonic() - started)
+        return result
+
+class ReplaySMTP:
+    """Local stand-in for the SMTP server; messages go to REPLAY_DIR/outbox.jsonl"""
+
+    def __init__(self, host='', port=0, *args, **kwargs):
+        self.host = host
+        self.port = port
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.quit()
+
+    def ehlo(self, *args, **kwargs):
+        return 250, b'replay'
+
+    def starttls(self, *args, **kwargs):
+        return 220, b'replay'
+
+    def login(self, user, password, *args, **kwargs):
+        return 235, b'replay'
+
+    def send_message(self, msg, *args, **kwargs):
+        time.sleep(latency(_recorded_smtp_latency()))
+        os.makedirs(REPLAY_DIR, exist_ok=True)
+        with open(os.path.join(REPLAY_DIR, 'outbox.jsonl'), 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'to': msg.get('To'), 'subject': msg.get('Subject'),
+                                'message': msg.as_string()}) + '\n')
+        return {}
+
+    def quit(self):
+        return 221, b'replay'
+
+_installed = False
+_announced = False
+_install_lock = threading.Lock()
+
+def install(announce=True):
+    """Route HTTP and SMTP through the recorder or the stand-ins, as REPLAY_MODE says.
+
+    Safe to call more than once. With announce=False (behind a menu) the
+    mode line is left for the next call to print.
+    """
+    global _installed, _announced
+    if MODE not in ('record', 'replay'):
+        return
+    with _install_lock:
+        if not _installed:
+            _patch()
+            _installed = True
+        if announce and not _announced:
+            _announced = True
+            print(f"Service {MODE} mode: exchanges in {os.path.abspath(REPLAY_DIR)}")
+
+def _patch():
+    requests.Session.send = _requests_send(requests.Session.send)
+    try:
+        import httpx
+    except ImportError:
+        pass
+    else:
+        httpx.HTTPTransport.handle_request = _httpx_send(httpx.HTTPTransport.handle_request, httpx)
+        httpx.AsyncHTTPTransport.handle_async_request = _httpx_send_async(
+            httpx.AsyncHTTPTransport.handle_async_request, httpx)
+
+    smtplib.SMTP = RecordingSMTP if MODE == 'record' else ReplaySMTP
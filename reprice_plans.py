@@ -0,0 +1,166 @@
+import os
+import sys
+import asyncio
+from datetime import datetime
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+import replay
+from database import connect_to_mongodb
+from flight import flight_search_key
+from async_flight import AsyncAmadeusAPI
+from flight_offers import format_flight_options
+
+load_dotenv()
+
+# Searches in flight at once; the shared rate limiter still paces them
+REPRICE_CONCURRENCY = int(os.getenv('REPRICE_CONCURRENCY', '4'))
+# Updates sent per bulk_write call
+REPRICE_BATCH_SIZE = int(os.getenv('REPRICE_BATCH_SIZE', '500'))
+# Best-price changes smaller than this are not written back
+PRICE_TOLERANCE = float(os.getenv('REPRICE_TOLERANCE', '0.01'))
+
+AMADEUS_CLASSES = {
+    'economy': 'ECONOMY',
+    'business': 'BUSINESS',
+    'first': 'FIRST'
+}
+
+# Only the fields needed to rebuild the search and compare prices
+PLAN_PROJECTION = {
+    'search_id': 1,
+    'trip_details.flight_routes.origin': 1,
+    'trip_details.flight_routes.destination': 1,
+    'trip_details.flight_routes.departure_date': 1,
+    'trip_details.travel_class': 1,
+    'trip_details.non_stop': 1,
+    'customer_info.total_travelers': 1,
+    'flight_options.price': 1,
+}
+
+def upcoming_plans(collection, today=None):
+    """Stored plans whose first flight hasn't left yet"""
+    today = today or datetime.now().date().isoformat()
+    # Dates are stored as YYYY-MM-DD, so string order is date order
+    return collection.find(
+        {'trip_details.flight_routes.0.departure_date': {'$gte': today}},
+        PLAN_PROJECTION
+    )
+
+def plan_search(plan):
+    """Flight search arguments for a stored plan, or None if it has no routes"""
+    details = plan.get('trip_details') or {}
+    routes = [
+        {'origin': route['origin'], 'destination': route['destination'], 'departure_date': route['departure_date']}
+        for route in details.get('flight_routes') or []
+    ]
+    if not routes:
+        return None
+
+    travelers = (plan.get('customer_info') or {}).get('total_travelers') or {}
+    travel_class = details.get('travel_class') or 'economy'
+    return {
+        'flight_routes': routes,
+        'travel_class': AMADEUS_CLASSES.get(travel_class.lower(), 'ECONOMY'),
+        'adults': travelers.get('adults', 1),
+        'children': travelers.get('children', 0),
+        'infants': travelers.get('infants', 0),
+        # Plans stored before non_stop was recorded are treated as allowing stops
+        'non_stop': details.get('non_stop', False)
+    }
+
+def group_plans(plans):
+    """Collapse plans with identical searches: {search key: (search, [plans])}"""
+    groups = {}
+    for plan in plans:
+        search = plan_search(plan)
+        if search is None:
+            continue
+        key = flight_search_key(search['flight_routes'], search['adults'], search['children'], search['infants'],
+                                search['travel_class'], 'EUR', 20, search['non_stop'])
+        groups.setdefault(key, (search, []))[1].append(plan)
+    return groups
+
+async def price_searches(groups, concurrency=REPRICE_CONCURRENCY):
+    """Run each distinct search once, at most `concurrency` at a time: {search key: offers or None}"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with AsyncAmadeusAPI() as amadeus:
+        async def price(key, search):
+            async with semaphore:
+                response = await amadeus.search_flights_async(**search)
+            return key, response['data'] if response else None
+
+        return dict(await asyncio.gather(*(price(key, search) for key, (search, _) in groups.items())))
+
+def best_price(prices):
+    prices = [price for price in prices if price is not None]
+    return min(prices) if prices else None
+
+def price_updates(groups, results, now=None):
+    """UpdateOne requests for the plans whose best price changed"""
+    now = now or datetime.now()
+    updates = []
+    for key, (search, plans) in groups.items():
+        offers = results.get(key)
+        if not offers:
+            continue
+        new_best = best_price(offer.price for offer in offers)
+
+        for plan in plans:
+            old_best = best_price(option.get('price') for option in plan.get('flight_options') or [])
+            if old_best is not None and abs(new_best - old_best) < PRICE_TOLERANCE:
+                continue
+            # Keep the user-facing class name, as FlightOption does
+            travel_class = (plan.get('trip_details') or {}).get('travel_class') or 'economy'
+            flight_options = [offer.option_fields(travel_class) for offer in offers]
+            updates.append(UpdateOne(
+                {'_id': plan['_id']},
+                {'$set': {
+                    'flight_options': flight_options,
+                    # The text copy is what emails and older views show, so it must agree
+                    'flight_options_text': format_flight_options(flight_options),
+                    'previous_best_price': old_best,
+                    'best_price': new_best,
+                    'repriced_at': now
+                }}
+            ))
+    return updates
+
+def reprice_plans(collection=None, concurrency=REPRICE_CONCURRENCY, dry_run=False):
+    """Re-price every upcoming plan, one Amadeus search per distinct query.
+
+    Returns counts of plans scanned, distinct searches, failed searches,
+    changed plans and documents updated.
+    """
+    if collection is None:
+        collection = connect_to_mongodb()
+    if collection is None:
+        print("Error: Could not connect to database")
+        return None
+
+    plans = list(upcoming_plans(collection))
+    groups = group_plans(plans)
+    results = asyncio.run(price_searches(groups, concurrency)) if groups else {}
+    updates = price_updates(groups, results)
+
+    updated = 0
+    if not dry_run:
+        for start in range(0, len(updates), REPRICE_BATCH_SIZE):
+            # Unordered, so one bad document doesn't stop the rest of the batch
+            result = collection.bulk_write(updates[start:start + REPRICE_BATCH_SIZE], ordered=False)
+            updated += result.modified_count
+
+    stats = {
+        'plans': len(plans),
+        'searches': len(groups),
+        'failed_searches': sum(1 for offers in results.values() if not offers),
+        'changed': len(updates),
+        'updated': updated
+    }
+    print(f"Re-priced {stats['plans']} plans with {stats['searches']} searches "
+          f"({stats['failed_searches']} failed): {stats['changed']} changed, {stats['updated']} updated")
+    return stats
+
+if __name__ == "__main__":
+    replay.install()
+    reprice_plans(dry_run='--dry-run' in sys.argv[1:])
@@ -0,0 +1,312 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Overall time budget for one call, including retries and hedges (seconds)
+DEFAULT_DEADLINE = float(os.getenv('AMADEUS_DEADLINE', '20'))
+DEFAULT_MAX_RETRIES = int(os.getenv('AMADEUS_MAX_RETRIES', '2'))
+RETRY_BASE_DELAY = float(os.getenv('AMADEUS_RETRY_BASE_DELAY', '0.5'))
+RETRY_MAX_DELAY = float(os.getenv('AMADEUS_RETRY_MAX_DELAY', '4'))
+
+# Send a duplicate request once an attempt is slower than this latency quantile
+HEDGE_QUANTILE = float(os.getenv('AMADEUS_HEDGE_QUANTILE', '0.95'))
+# Latency samples needed before hedging starts; set 0 to disable hedging
+HEDGE_MIN_SAMPLES = int(os.getenv('AMADEUS_HEDGE_MIN_SAMPLES', '20'))
+LATENCY_WINDOW = 200
+
+# Consecutive failures that open the breaker, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('AMADEUS_BREAKER_THRESHOLD', '5'))
+BREAKER_RESET_TIMEOUT = float(os.getenv('AMADEUS_BREAKER_RESET', '30'))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class TransientError(Exception):
+    """A failure worth retrying: timeouts, network errors, 429 and 5xx responses"""
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that the breaker has marked as down"""
+
+def backoff_delay(attempt, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY):
+    """Exponential backoff with full jitter for the given retry attempt (1-based)"""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+class LatencyTracker:
+    """Sliding window of recent call latencies"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q, min_samples=1):
+        """Latency at quantile q, or None until min_samples are recorded"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples or len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+class CircuitBreaker:
+    """Stops calls to an upstream after repeated failures.
+
+    Closed: calls go through. Open: calls fail fast until reset_timeout has
+    passed. Half-open: one trial call is let through; success closes the
+    breaker, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.times_opened = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """Return True if a call may go to the upstream now"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = HALF_OPEN
+            if self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def release(self):
+        """End a trial call that neither succeeded nor failed upstream"""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.times_opened += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+class ResilientCaller:
+    """Runs idempotent upstream calls with a deadline, retries, hedging and a circuit breaker.
+
+    The wrapped function raises TransientError for failures worth retrying;
+    anything it returns, including None for a rejected request, counts as
+    an answer from a healthy upstream.
+    """
+
+    def __init__(self, name, deadline=DEFAULT_DEADLINE, max_retries=DEFAULT_MAX_RETRIES,
+                 hedge_quantile=HEDGE_QUANTILE, hedge_min_samples=HEDGE_MIN_SAMPLES,
+                 breaker=None, rate_limiter=None, max_workers=16):
+        self.name = name
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        # Every attempt, hedges and retries included, takes a token first.
+        # Latency is measured after the wait, so queueing doesn't trigger hedges.
+        self.rate_limiter = rate_limiter
+        self.latency = LatencyTracker()
+        # Sync attempts run here so a hung request can't hold the caller past its deadline
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._stats = {
+            'calls': 0,
+            'retries': 0,
+            'hedges': 0,
+            'hedge_wins': 0,
+            'timeouts': 0,
+            'failures': 0,
+            'short_circuits': 0,
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None while there is too little history"""
+        if self.hedge_min_samples <= 0:
+            return None
+        return self.latency.quantile(self.hedge_quantile, self.hedge_min_samples)
+
+    def _start(self):
+        self._count('calls')
+        if not self.breaker.allow():
+            self._count('short_circuits')
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        return time.monotonic() + self.deadline
+
+    def _next_retry(self, attempt, deadline):
+        """Return the backoff delay after a failed attempt, or None to give up.
+
+        The breaker counts one failure per call that gives up, not one per
+        attempt, so a single call's retries can't open it on their own.
+        """
+        delay = backoff_delay(attempt)
+        # A half-open trial, or a breaker another call has opened, isn't retried
+        if attempt > self.max_retries or time.monotonic() + delay >= deadline or not self.breaker.allow():
+            self.breaker.record_failure()
+            self._count('failures')
+            return None
+        self._count('retries')
+        return delay
+
+    def call(self, func):
+        """Call func() until it answers, the retries run out or the deadline passes"""
+        deadline = self._start()
+        attempt = 0
+        while True:
+            try:
+                result = self._hedged(func, deadline)
+            except TransientError:
+                attempt += 1
+                delay = self._next_retry(attempt, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            except Exception:
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def _submit(self, func):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        return self._executor.submit(func)
+
+    async def _submit_async(self, func):
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async()
+        return asyncio.ensure_future(func())
+
+    def _hedged(self, func, deadline):
+        """One attempt, plus a duplicate if the first is slower than usual"""
+        first = self._submit(func)
+        started = time.monotonic()
+        pending = {first}
+
+        hedge_delay = self.hedge_delay()
+        if hedge_delay is not None and started + hedge_delay < deadline:
+            done, _ = wait(pending, timeout=hedge_delay)
+            if not done:
+                self._count('hedges')
+                pending.add(self._submit(func))
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                # Threads can't be cancelled; a late answer is simply ignored
+                self._count('timeouts')
+                raise TransientError(f"{self.name} call exceeded its {self.deadline:g}s deadline")
+            for future in done:
+                try:
+                    result = future.result()
+                except TransientError as e:
+                    error = e
+                    continue
+                if future is not first:
+                    self._count('hedge_wins')
+                self.latency.record(time.monotonic() - started)
+                return result
+        raise error
+
+    async def call_async(self, func):
+        """Awaitable call(); func is a coroutine function, called once per attempt"""
+        deadline = self._start()
+        attempt = 0
+        while True:
+            try:
+                result = await self._hedged_async(func, deadline)
+            except TransientError:
+                attempt += 1
+                delay = self._next_retry(attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Includes cancellation of the awaiting task
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            return result
+
+    async def _hedged_async(self, func, deadline):
+        first = await self._submit_async(func)
+        started = time.monotonic()
+        pending = {first}
+        try:
+            hedge_delay = self.hedge_delay()
+            if hedge_delay is not None and started + hedge_delay < deadline:
+                done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+                if not done:
+                    self._count('hedges')
+                    pending.add(await self._submit_async(func))
+
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self._count('timeouts')
+                    raise TransientError(f"{self.name} call exceeded its {self.deadline:g}s deadline")
+                for task in done:
+                    try:
+                        result = task.result()
+                    except TransientError as e:
+                        error = e
+                        continue
+                    if task is not first:
+                        self._count('hedge_wins')
+                    self.latency.record(time.monotonic() - started)
+                    return result
+            raise error
+        finally:
+            # The losing hedge or a timed-out attempt is no longer needed
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        """Return call counters, breaker state and recent latency quantiles"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['breaker_state'] = self.breaker.state
+        stats['breaker_opened'] = self.breaker.times_opened
+        for label, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+            latency = self.latency.quantile(q)
+            stats[f'latency_{label}'] = round(latency, 3) if latency is not None else None
+        return stats
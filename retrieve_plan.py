@@ -2,14 +2,50 @@ from database import connect_to_mongodb
 from datetime import datetime
 import sys
 
-def get_plan_by_search_id(search_id, collection):
-    """Retrieve a travel plan using its search ID"""
+# Fields fetched for each view of a plan; None fetches the whole document
+PLAN_PROJECTIONS = {
+    'full': None,
+    'summary': {
+        'search_id': 1,
+        'timestamp': 1,
+        'customer_info.total_travelers': 1,
+        'trip_details.trip_type': 1,
+        'trip_details.travel_class': 1,
+        'trip_details.flight_routes.origin': 1,
+        'trip_details.flight_routes.destination': 1,
+        'trip_details.flight_routes.departure_date': 1,
+        'flight_options.type': 1,
+        'flight_options.price': 1,
+        'itinerary.name': 1,
+        'itinerary.hotel': 1,
+        'itinerary.days.date': 1,
+    },
+    'flights': {
+        'search_id': 1,
+        'trip_details.travel_class': 1,
+        'flight_options': 1,
+    },
+}
+
+def plan_projection(view='full', day=None):
+    """Projection for a view; 'day' fetches only the given day (1-based) of the itinerary"""
+    if view == 'day':
+        return {
+            'search_id': 1,
+            'itinerary.name': 1,
+            'itinerary.hotel': 1,
+            'itinerary.days': {'$slice': [max(0, (day or 1) - 1), 1]},
+        }
+    return PLAN_PROJECTIONS[view]
+
+def get_plan_by_search_id(search_id, collection, view='full', day=None):
+    """Retrieve a travel plan, or only the fields one view shows, using its search ID"""
     try:
         if collection is None:
             print("Error: No valid database connection")
             return None
             
-        plan = collection.find_one({"search_id": search_id})
+        plan = collection.find_one({"search_id": search_id}, plan_projection(view, day))
         if plan is not None:
             return plan
         
@@ -27,23 +63,45 @@ def format_flight_details(flight_option):
     details.append(f"Total Price: €{flight_option['price']}")
     details.append(f"Travel Class: {flight_option['travel_class']}")
     
-    for i, flight in enumerate(flight_option['flights'], 1):
+    for i, flight in enumerate(flight_option['segments'], 1):
         details.append(f"\nFlight {i}:")
         details.append(f"  From: {flight['origin']}")
         details.append(f"  To: {flight['destination']}")
         details.append(f"  Departure: {flight['departure_time']}")
         details.append(f"  Arrival: {flight['arrival_time']}")
         details.append(f"  Duration: {flight['duration']}")
-        
-        if flight.get('transit_airports'):
-            details.append("\n  Transit Points:")
-            for transit in flight['transit_airports']:
-                details.append(f"    Airport: {transit['airport']}")
-                details.append(f"    Arrival: {transit['arrival_time']}")
-                details.append(f"    Departure: {transit['departure_time']}")
+        # The number already carries the airline code, e.g. TP123
+        details.append(f"  Flight: {flight['flight_number']}")
     
     return "\n".join(details)
 
+def format_day(day, number=None):
+    """Format one DayPlan of a structured itinerary"""
+    lines = [f"Day {number} - {day['date']}" if number else day['date']]
+    flight = day.get('flight')
+    if flight:
+        route = " -> ".join([flight['segments'][0]['origin']] + [s['destination'] for s in flight['segments']]) \
+            if flight.get('segments') else ""
+        lines.append(f"  Flight: {route} (€{flight['price']})")
+    for activity in day.get('activities') or []:
+        lines.append(f"  - {activity['name']} ({activity['location']})")
+        lines.append(f"    {activity['description']}")
+        lines.append(f"    Why: {activity['why_its_suitable']}")
+        lines.append(f"    Rating: {activity['rating']}")
+    if day.get('restaurants'):
+        lines.append(f"  Restaurants: {', '.join(day['restaurants'])}")
+    return "\n".join(lines)
+
+def format_itinerary(itinerary, first_day=1):
+    """Format a structured itinerary (an Itinerary as stored) for display"""
+    lines = [itinerary.get('name', 'Your Itinerary')]
+    if itinerary.get('hotel'):
+        lines.append(f"Hotel: {itinerary['hotel']}")
+    for i, day in enumerate(itinerary.get('days') or [], first_day):
+        lines.append("")
+        lines.append(format_day(day, i))
+    return "\n".join(lines)
+
 def display_plan(plan):
     """Display the travel plan in a readable format"""
     if not plan:
@@ -84,11 +142,62 @@ def display_plan(plan):
         
     print(f"\nCreated on: {plan['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}")
     
-    if 'final_itinerary' in plan and plan['final_itinerary']:
+    if plan.get('itinerary'):
+        print("\nDetailed Itinerary:")
+        print("-"*20)
+        print(format_itinerary(plan['itinerary']))
+    elif 'final_itinerary' in plan and plan['final_itinerary']:
         print("\nDetailed Itinerary:")
         print("-"*20)
         print(plan['final_itinerary'])
 
+def display_summary(plan):
+    """Display a plan fetched with the 'summary' projection"""
+    if not plan:
+        return
+    trip = plan.get('trip_details', {})
+    travelers = plan.get('customer_info', {}).get('total_travelers', {})
+    print(f"\nTravel Plan {plan['search_id']}: {trip.get('trip_type', '')}, {trip.get('travel_class', '')}")
+    print(" -> ".join([trip['flight_routes'][0]['origin']] + [route['destination'] for route in trip['flight_routes']])
+          if trip.get('flight_routes') else "")
+    print(f"Travelers: {travelers.get('adults', 0)} adults, {travelers.get('children', 0)} children, "
+          f"{travelers.get('infants', 0)} infants")
+    prices = [option['price'] for option in plan.get('flight_options') or []]
+    if prices:
+        print(f"Flights from: €{min(prices)}")
+    itinerary = plan.get('itinerary')
+    if itinerary:
+        days = itinerary.get('days') or []
+        print(f"{itinerary.get('name', '')} - {len(days)} days"
+              + (f", {days[0]['date']} to {days[-1]['date']}" if days else ""))
+        if itinerary.get('hotel'):
+            print(f"Hotel: {itinerary['hotel']}")
+    if plan.get('timestamp'):
+        print(f"Created on: {plan['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}")
+
+def display_day(plan, day):
+    """Display a plan fetched with the 'day' projection"""
+    if not plan:
+        return
+    days = (plan.get('itinerary') or {}).get('days') or []
+    if not days:
+        print(f"\nNo day {day} in plan {plan['search_id']}")
+        return
+    print(f"\n{plan['itinerary'].get('name', '')}")
+    print(format_day(days[0], day))
+
+def display_flights(plan):
+    """Display a plan fetched with the 'flights' projection"""
+    if not plan:
+        return
+    options = plan.get('flight_options') or []
+    if not options:
+        print(f"\nNo flight options stored for plan {plan['search_id']}")
+        return
+    for option in options:
+        print()
+        print(format_flight_details(option))
+
 def main():
     # Connect to cloud database
     collection = connect_to_mongodb()
@@ -104,10 +213,24 @@ def main():
             print("\nGoodbye!")
             sys.exit(0)
         
-        # Retrieve and display the plan
-        plan = get_plan_by_search_id(search_id, collection)
+        view = input("Show (f)ull plan, (s)ummary, one (d)ay or f(l)ights? [f]: ").strip().lower()
+        view = {'s': 'summary', 'd': 'day', 'l': 'flights'}.get(view, 'full')
+        day = None
+        if view == 'day':
+            day = input("Which day (1, 2, ...)? ").strip()
+            day = int(day) if day.isdigit() and int(day) > 0 else 1
+
+        # Retrieve only the fields the chosen view shows
+        plan = get_plan_by_search_id(search_id, collection, view, day)
         if plan:
-            display_plan(plan)
+            if view == 'summary':
+                display_summary(plan)
+            elif view == 'day':
+                display_day(plan, day)
+            elif view == 'flights':
+                display_flights(plan)
+            else:
+                display_plan(plan)
         
         # Ask if user wants to search for another plan
         while True:
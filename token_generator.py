@@ -1,32 +1,74 @@
-import requests
 import os
+import time
+import threading
 from dotenv import load_dotenv
+from http_pool import get_session, REQUEST_TIMEOUT
 
 load_dotenv()
 
-def generate_token():
-    """Generate Amadeus API token"""
-    url = "https://test.api.amadeus.com/v1/security/oauth2/token"
-    
+TOKEN_PATH = "/v1/security/oauth2/token"
+TOKEN_URL = f"https://test.api.amadeus.com{TOKEN_PATH}"
+# Refresh this many seconds before the token actually expires
+TOKEN_REFRESH_MARGIN = 60
+
+# Cached token per token URL, so test and production hosts don't share one
+_tokens = {}
+_token_lock = threading.Lock()
+
+class TokenError(Exception):
+    """Amadeus did not issue an access token"""
+
+def token_url(host, ssl=True, port=443):
+    """The OAuth token endpoint of an Amadeus API host"""
+    scheme = 'https' if ssl else 'http'
+    default_port = 443 if ssl else 80
+    netloc = host if port in (None, default_port) else f"{host}:{port}"
+    return f"{scheme}://{netloc}{TOKEN_PATH}"
+
+def _request_token(url=TOKEN_URL):
+    """Request a new Amadeus token, raising TokenError if none is issued"""
     headers = {
         "Content-Type": "application/x-www-form-urlencoded"
     }
-    
+
     data = {
         "grant_type": "client_credentials",
         "client_id": os.getenv('AMADEUS_API_KEY'),
         "client_secret": os.getenv('AMADEUS_API_SECRET')
     }
-    
+
     try:
-        response = requests.post(url, headers=headers, data=data)
-        if response.status_code == 200:
-            token_data = response.json()
-            if token_data.get('state') == 'approved':
-                return token_data.get('access_token')
-        print(f"Error generating token: {response.status_code}")
-        print(response.json())
-        return None
+        response = get_session().post(url, headers=headers, data=data, timeout=REQUEST_TIMEOUT)
     except Exception as e:
-        print(f"Error in token generation: {str(e)}")
-        return None 
\ No newline at end of file
+        raise TokenError(f"Token request to {url} failed: {str(e)}") from e
+    if response.status_code != 200:
+        raise TokenError(f"Token request to {url} returned {response.status_code}: {response.text[:200]}")
+    token_data = response.json()
+    if token_data.get('state') != 'approved' or not token_data.get('access_token'):
+        raise TokenError(f"Token request to {url} was not approved: {token_data.get('state')}")
+    return token_data
+
+def generate_token(force_refresh=False, url=TOKEN_URL):
+    """Return an Amadeus API token for url, reusing the cached one until shortly before it expires.
+
+    Raises TokenError if a new token is needed and can't be had.
+    """
+    # One lock for the whole process, so concurrent sessions share a single refresh
+    with _token_lock:
+        token = _tokens.get(url)
+        if force_refresh or token is None or time.time() >= token['expires_at'] - TOKEN_REFRESH_MARGIN:
+            token_data = _request_token(url)
+            token = _tokens[url] = {
+                'access_token': token_data['access_token'],
+                'expires_at': time.time() + token_data.get('expires_in', 0)
+            }
+        return token['access_token']
+
+class SharedAccessToken:
+    """Stand-in for the Amadeus SDK's AccessToken backed by the process-wide token cache"""
+
+    def __init__(self, url=TOKEN_URL):
+        self.url = url
+
+    def _bearer_token(self):
+        return f"Bearer {generate_token(url=self.url)}"
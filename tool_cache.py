@@ -0,0 +1,311 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from pymongo import MongoClient
+from dotenv import load_dotenv
+from crewai_tools import SerperDevTool, ScrapeWebsiteTool
+import replay
+from cache import TTLCache
+from crew_metrics import tool_call, tool_cache_hit
+
+load_dotenv()
+
+# Where results are shared: 'mongo' across replicas, 'disk' on one machine, or 'memory'
+TOOL_CACHE_BACKEND = os.getenv('TOOL_CACHE_BACKEND', 'mongo' if os.getenv('MONGODB_ATLAS_URI') else 'disk').lower()
+TOOL_CACHE_DIR = os.getenv('TOOL_CACHE_DIR', '.tool_cache')
+# Search rankings drift daily; page content changes more slowly
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', str(24 * 3600)))
+SCRAPE_CACHE_TTL = int(os.getenv('SCRAPE_CACHE_TTL', str(7 * 24 * 3600)))
+# Shared entries kept per tool before the least recently used are evicted
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv('TOOL_CACHE_MAX_ENTRIES', '20000'))
+# Entries also kept in this process, in front of the shared store
+TOOL_CACHE_MEMORY_ENTRIES = int(os.getenv('TOOL_CACHE_MEMORY_ENTRIES', '512'))
+# Empty results and errors are remembered briefly, so a failing tool isn't hammered
+TOOL_CACHE_NEGATIVE_TTL = int(os.getenv('TOOL_CACHE_NEGATIVE_TTL', '60'))
+# Writes between eviction passes over the shared store
+EVICT_EVERY = 100
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = ('utm_', 'gclid', 'fbclid')
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a search query"""
+    return ' '.join(str(query).lower().split())
+
+def normalize_url(url):
+    """Canonical form of a URL: lower-case host, no fragment, tracking or default port, sorted query"""
+    parts = urlsplit(str(url).strip())
+    scheme = parts.scheme.lower() or 'http'
+    host = (parts.hostname or '').lower()
+    if parts.port and (scheme, parts.port) not in (('http', 80), ('https', 443)):
+        host = f"{host}:{parts.port}"
+    query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if not name.lower().startswith(TRACKING_PARAMS))
+    return urlunsplit((scheme, host, parts.path.rstrip('/') or '/', urlencode(query), ''))
+
+def cache_key(tool, *parts):
+    return hashlib.sha256(json.dumps([tool, *parts]).encode('utf-8')).hexdigest()
+
+class MongoToolStore:
+    """Tool results in a Mongo collection shared by every replica.
+
+    A TTL index drops expired entries; every EVICT_EVERY writes the least
+    recently used entries above max_entries are deleted.
+    """
+
+    def __init__(self, collection, max_entries=TOOL_CACHE_MAX_ENTRIES):
+        self.collection = collection
+        self.max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+        collection.create_index('expires_at', expireAfterSeconds=0)
+        collection.create_index([('tool', 1), ('used_at', 1)])
+
+    def get(self, tool, key):
+        now = datetime.now(timezone.utc)
+        entry = self.collection.find_one_and_update(
+            # The TTL monitor only runs once a minute, so check expiry here too
+            {'_id': key, 'expires_at': {'$gt': now}},
+            {'$set': {'used_at': now}},
+            projection={'value': 1}
+        )
+        return entry['value'] if entry else None
+
+    def set(self, tool, key, value, ttl):
+        now = datetime.now(timezone.utc)
+        self.collection.update_one(
+            {'_id': key},
+            {'$set': {'tool': tool, 'value': value, 'used_at': now, 'expires_at': now + timedelta(seconds=ttl)}},
+            upsert=True
+        )
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % EVICT_EVERY == 0
+        if evict:
+            self.evict(tool)
+
+    def evict(self, tool):
+        excess = self.collection.count_documents({'tool': tool}) - self.max_entries
+        if excess > 0:
+            oldest = self.collection.find({'tool': tool}, {'_id': 1}).sort('used_at', 1).limit(excess)
+            self.collection.delete_many({'_id': {'$in': [entry['_id'] for entry in oldest]}})
+
+class DiskToolStore:
+    """Tool results as one JSON file per entry; file mtime tracks last use"""
+
+    def __init__(self, directory=TOOL_CACHE_DIR, max_entries=TOOL_CACHE_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, tool, key):
+        return os.path.join(self.directory, tool, f"{key}.json")
+
+    def get(self, tool, key):
+        path = self._path(tool, key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry['expires_at'] <= time.time():
+            return None
+        os.utime(path)
+        return entry['value']
+
+    def set(self, tool, key, value, ttl):
+        path = self._path(tool, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so other processes never read a partial file
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'value': value, 'expires_at': time.time() + ttl}, f)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % EVICT_EVERY == 0
+        if evict:
+            self.evict(tool)
+
+    def evict(self, tool):
+        directory = os.path.join(self.directory, tool)
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith('.json'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_entries)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_tool_store():
+    """The shared store for TOOL_CACHE_BACKEND, or None to cache in memory only"""
+    global _store
+    # Recordings should capture the outbound calls, so only memory caches them then
+    if replay.MODE != 'off' or TOOL_CACHE_BACKEND == 'memory':
+        return None
+    with _store_lock:
+        if _store is None:
+            if TOOL_CACHE_BACKEND == 'mongo':
+                try:
+                    client = MongoClient(os.getenv('MONGODB_ATLAS_URI'), serverSelectionTimeoutMS=5000)
+                    _store = MongoToolStore(client['trip-cloud']['tool_cache'])
+                except Exception as e:
+                    print(f"Error: Failed to connect to tool cache, using disk: {str(e)}")
+            if _store is None:
+                _store = DiskToolStore()
+        return _store
+
+class ToolCache:
+    """Results of one tool, in memory and in the shared store.
+
+    Concurrent misses for one key in this process share a single tool call,
+    including its empty result or error; those are kept in memory for
+    TOOL_CACHE_NEGATIVE_TTL seconds, not stored. Store errors are reported
+    and treated as misses, so a cache outage never stops the tool working.
+    """
+
+    def __init__(self, name, ttl, memory_entries=TOOL_CACHE_MEMORY_ENTRIES):
+        self.name = name
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=memory_entries, ttl=ttl, name=f"{name} cache")
+        # (result, exception) of calls that failed or came back empty
+        self.negative = TTLCache(maxsize=memory_entries, ttl=TOOL_CACHE_NEGATIVE_TTL, name=f"{name} negative cache")
+        self._lock = threading.Lock()
+        self._stats = {'store_hits': 0, 'calls': 0, 'negative_hits': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _read_store(self, key):
+        store = get_tool_store()
+        if store is None:
+            return None
+        try:
+            value = store.get(self.name, key)
+        except Exception as e:
+            print(f"Error reading {self.name} cache: {str(e)}")
+            return None
+        if value is not None:
+            self._count('store_hits')
+        return value
+
+    def _write_store(self, key, value):
+        store = get_tool_store()
+        if store is None:
+            return
+        try:
+            store.set(self.name, key, value, self.ttl)
+        except Exception as e:
+            print(f"Error writing {self.name} cache: {str(e)}")
+
+    def get(self, key):
+        """Return the cached value for key, or None"""
+        value = self.memory.get(key)
+        if value is None:
+            value = self._read_store(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.negative.invalidate(key)
+        self.memory.set(key, value)
+        self._write_store(key, value)
+
+    def get_or_run(self, key, run):
+        """Return the cached result for key, calling run() on a miss.
+
+        Callers that waited on another thread's call get its result, or
+        its exception raised again, rather than calling run() themselves.
+        """
+        def load():
+            value = self._read_store(key)
+            if value is not None:
+                return value
+
+            self._count('calls')
+            try:
+                value = run()
+            except Exception as e:
+                self.negative.set(key, (None, e))
+                raise
+            if value:
+                self._write_store(key, value)
+                return value
+            # Empty results are usually failures, so they are only kept briefly
+            self.negative.set(key, (value, None))
+            return None
+
+        outcome = self.negative.get(key)
+        if outcome is None:
+            value = self.memory.get_or_load(key, load)
+            if value is not None:
+                return value
+            # The call, ours or the one we waited for, failed or came back empty
+            outcome = self.negative.peek(key, (None, None))
+        else:
+            self._count('negative_hits')
+        value, error = outcome
+        if error is not None:
+            raise error
+        return value
+
+    def stats(self):
+        """Return memory hit/miss counters plus shared-store hits and tool calls"""
+        with self._lock:
+            return dict(self.memory.stats(), **self._stats)
+
+def run_cached(cache, key, run):
+    """cache.get_or_run(key, run), timing run() only when it runs and counting a cache hit otherwise"""
+    ran = False
+
+    def timed_run():
+        nonlocal ran
+        ran = True
+        with tool_call(cache.name):
+            return run()
+
+    try:
+        return cache.get_or_run(key, timed_run)
+    finally:
+        if not ran:
+            tool_cache_hit(cache.name)
+
+search_cache = ToolCache('search', SEARCH_CACHE_TTL)
+scrape_cache = ToolCache('scrape', SCRAPE_CACHE_TTL)
+
+class CachedSerperDevTool(SerperDevTool):
+    """SerperDevTool whose results are shared across plans and replicas"""
+
+    def _run(self, **kwargs):
+        query = kwargs.get("search_query") or kwargs.get("query")
+        key = cache_key('search', normalize_query(query), kwargs.get("n_results", self.n_results),
+                        self.country, self.location, self.locale, self.search_url)
+        return run_cached(search_cache, key, lambda: super(CachedSerperDevTool, self)._run(**kwargs))
+
+class CachedScrapeWebsiteTool(ScrapeWebsiteTool):
+    """ScrapeWebsiteTool whose page text is shared across plans and replicas"""
+
+    def _run(self, **kwargs):
+        website_url = kwargs.get("website_url", self.website_url)
+        key = cache_key('scrape', normalize_url(website_url))
+        return run_cached(scrape_cache, key, lambda: super(CachedScrapeWebsiteTool, self)._run(**kwargs))
+
+def tool_cache_stats():
+    """Cache counters for each tool"""
+    return {'search': search_cache.stats(), 'scrape': scrape_cache.stats()}
@@ -32,6 +32,8 @@ def show_progress(message="Loading"):
     thread = Thread(target=progress_worker)
     thread.daemon = True
     thread.start()
+    # Lets callers wait for the line to be cleared before printing on it
+    stop_event.worker = thread
     
     return stop_event
 